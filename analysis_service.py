@@ -1,17 +1,451 @@
 """
 Serviço de Análise de Insights usando OpenAI
 """
-import json
+import hashlib
+import logging
 import re
-from typing import Dict, List, Optional
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Literal, Optional
 from datetime import datetime
+import httpx
+import ijson
+import orjson
+import tiktoken
+from diskcache import Cache
 from openai import OpenAI
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+logger = logging.getLogger(__name__)
+
+# Transcrições acima deste tamanho (em tokens) são analisadas em map-reduce
+MAP_REDUCE_THRESHOLD_TOKENS = 6000
+CHUNK_TOKENS = 2000
+CHUNK_OVERLAP_TOKENS = 200
+
+# Aproximação usada quando o tokenizador não está disponível
+CHARS_PER_TOKEN = 4
+
+# Orçamento (em tokens) do início da transcrição enviado na extração do vendedor
+# e na análise simplificada
+VENDOR_HEAD_TOKENS = 125
+FALLBACK_HEAD_TOKENS = 500
+
+# Apresentações típicas do vendedor ("Aqui é o João", "Meu nome é Maria", "Fala João aqui").
+# Só as frases de apresentação ignoram maiúsculas: o nome precisa começar com maiúscula
+_VENDOR_RX = re.compile(
+    r"(?i:aqui é (?:o|a)|aqui quem fala é (?:o|a)|meu nome é|fala|eu sou (?:o|a))\s+([A-ZÀ-Ý][a-zà-ÿ]{1,20})\b"
+)
+# Palavras capitalizadas que aparecem após as apresentações mas não são nomes
+_VENDOR_RX_STOPWORDS = frozenset({"Vivo", "Você", "Senhor", "Senhora", "Sr", "Sra", "Dona", "Seu", "Aqui"})
+# Caracteres removidos do nome do vendedor (mantém apenas letras)
+_NAME_CLEAN_RX = re.compile(r'[^a-zA-ZÀ-ÿ]')
+
+# Transcrições curtas são agrupadas em uma única chamada, até estes limites por lote
+SHORT_TRANSCRIPTION_CHARS = 3000
+BATCH_MAX_TOKENS = 10000
+BATCH_MAX_CALLS = 6
+
+# Triagem opcional: ligações curtas passam antes pelo esquema simplificado e só
+# recebem a análise completa quando a classificação for alta
+TRIAGE_MAX_CHARS = 5000
+TRIAGE_ESCALATE_CLASSES = frozenset({"A", "B"})
+
+# Conexões simultâneas mantidas pelo cliente HTTP compartilhado da OpenAI
+MAX_HTTP_CONNECTIONS = 64
+
+
+@lru_cache(maxsize=None)
+def _openai_client(api_key: str) -> OpenAI:
+    """
+    Retorna um cliente OpenAI compartilhado por chave de API, com pool HTTP/2,
+    para que várias instâncias do serviço reutilizem as mesmas conexões
+    """
+    http_client = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_HTTP_CONNECTIONS),
+        timeout=httpx.Timeout(600.0, connect=10.0)
+    )
+    return OpenAI(api_key=api_key, http_client=http_client)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str):
+    """
+    Retorna o tokenizador do modelo, ou None se não puder ser carregado
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except Exception as e:
+        logger.warning("⚠️ Tokenizador indisponível para %s, usando aproximação por caracteres: %s", model_name, e)
+        return None
+
+
+# Instruções fixas ficam na mensagem de sistema, idêntica em todas as chamadas de
+# análise (completa, em lote e simplificada), para aproveitar o cache de prefixo
+# de prompt da OpenAI; cada chamada varia apenas o esquema na mensagem do usuário
+_SYSTEM_PROMPT = """\
+Você é um especialista em análise de vendas com 20 anos de experiência. Analise a ligação de vendas do sistema VVN (Vivo Voz Negócio) enviada pelo usuário e forneça insights práticos e acionáveis.
+A ligação é enviada como TRANSCRIÇÃO ou, em ligações longas, como FATOS EXTRAÍDOS de cada trecho em ordem cronológica.
+
+INSTRUÇÕES PARA ANÁLISE:
+1. Identifique claramente quem é o VENDEDOR e quem é o CLIENTE na conversa (o vendedor geralmente se apresenta no início, ex.: "Aqui é o João da Vivo")
+2. Analise o comportamento, técnicas e performance do vendedor
+3. Avalie as reações, objeções e interesse do cliente
+4. Foque em insights que podem melhorar as vendas futuras
+5. Seja específico e prático nas suas observações
+
+IMPORTANTE:
+- Seja específico e prático nas suas observações
+- Base suas conclusões apenas no que está na transcrição
+- Se algo não estiver claro na transcrição, indique "não identificado"
+- Foque em insights que ajudem a melhorar vendas futuras
+- A nota do vendedor deve ser de 1 a 10, considerando técnicas, resultado e profissionalismo
+- Responda APENAS com o JSON válido, no formato pedido pelo usuário, sem texto adicional
+"""
+
+_ANALYSIS_SCHEMA = """\
+Forneça sua análise em formato JSON com estas informações específicas, usando exatamente as chaves abreviadas abaixo:
+
+{
+  "vend": "primeiro nome do vendedor (sem sobrenome) ou NÃO_IDENTIFICADO",
+  "sent": "positivo/neutro/negativo",
+  "score_sent": -1.0 a 1.0,
+  "satisf": "alta/media/baixa",
+  "perf": "excelente/boa/regular/ruim",
+  "nota": 1 a 10,
+
+  "prod": ["liste produtos/serviços específicos mencionados"],
+
+  "obj": ["liste objeções específicas do cliente como: preço alto, não precisa agora, etc."],
+
+  "tec": ["identifique técnicas como: rapport, descoberta de necessidades, apresentação de benefícios, fechamento, etc."],
+
+  "fortes": ["o que o vendedor fez bem: escuta ativa, argumentação convincente, etc."],
+
+  "melhoria": ["o que o vendedor pode melhorar: não interrompeu cliente, não perguntou sobre orçamento, etc."],
+
+  "result": "venda_fechada/follow_up_agendado/cliente_perdido/indefinido",
+
+  "passos": ["ações específicas recomendadas: ligar em X dias, enviar proposta, agendar visita, etc."],
+
+  "kw": ["termos importantes mencionados pelo cliente"],
+
+  "dur": "X minutos",
+
+  "nvl_int": "alto/medio/baixo",
+
+  "resumo": "Resumo de 2-3 frases explicando o que aconteceu na ligação e o resultado",
+
+  "momento": "Identifique o momento mais importante da conversa (quando cliente demonstrou interesse, fez objeção principal, etc.)",
+
+  "oport": ["o que o vendedor poderia ter feito diferente para melhorar o resultado"],
+
+  "perfil": "Descreva brevemente o perfil do cliente (empresa pequena/média/grande, setor, necessidades)",
+
+  "valor": "Se algum valor/preço foi mencionado na conversa",
+
+  "conc": ["se outros fornecedores foram mencionados"],
+
+  "urg": "alta/media/baixa - baseado na necessidade demonstrada pelo cliente",
+
+  "qual": "excelente/boa/regular/ruim - considerando clareza da conversa",
+
+  "rec_esp": ["sugestões práticas para este vendedor melhorar em próximas ligações"],
+
+  "classe": "A/B/C/D - onde A=excelente, B=boa, C=regular, D=ruim"
+}
+
+LEGENDA DAS CHAVES: vend=vendedor identificado, sent=sentimento geral, score_sent=score de sentimento,
+satisf=satisfação do cliente, perf=performance do vendedor, nota=nota do vendedor, prod=produtos mencionados,
+obj=objeções do cliente, tec=técnicas de vendas usadas, fortes=pontos fortes, melhoria=pontos de melhoria,
+result=resultado da conversa, passos=próximos passos, kw=palavras-chave, dur=duração estimada,
+nvl_int=nível de interesse do cliente, resumo=resumo executivo, momento=momento crítico,
+oport=oportunidades perdidas, perfil=perfil do cliente, valor=valor mencionado, conc=concorrentes citados,
+urg=urgência de compra, qual=qualidade da ligação, rec_esp=recomendações específicas, classe=classificação da ligação
+"""
+
+# O modelo responde com chaves abreviadas (menos tokens de saída), expandidas
+# para os nomes completos após a decodificação
+_KEY_MAP = {
+    "vend": "vendedor_identificado",
+    "sent": "sentimento_geral",
+    "score_sent": "score_sentimento",
+    "satisf": "satisfacao_cliente",
+    "perf": "performance_vendedor",
+    "nota": "nota_vendedor",
+    "prod": "produtos_mencionados",
+    "obj": "objecoes_cliente",
+    "tec": "tecnicas_vendas_usadas",
+    "fortes": "pontos_fortes",
+    "melhoria": "pontos_melhoria",
+    "result": "resultado_conversa",
+    "passos": "proximos_passos",
+    "kw": "palavras_chave",
+    "dur": "duracao_estimada",
+    "nvl_int": "nivel_interesse_cliente",
+    "resumo": "resumo_executivo",
+    "momento": "momento_critico",
+    "oport": "oportunidades_perdidas",
+    "perfil": "cliente_perfil",
+    "valor": "valor_mencionado",
+    "conc": "concorrentes_citados",
+    "urg": "urgencia_compra",
+    "qual": "qualidade_ligacao",
+    "rec_esp": "recomendacoes_especificas",
+    "classe": "classificacao_ligacao",
+}
+_ANALYSIS_KEYS = frozenset(_KEY_MAP)
+
+# A análise em lote usa o esquema completo com instruções adicionais
+_BATCH_SCHEMA = _ANALYSIS_SCHEMA + """
+ANÁLISE EM LOTE:
+As ligações abaixo são independentes e estão marcadas como LIGAÇÃO [1], LIGAÇÃO [2], etc.
+Analise cada uma separadamente e responda com {"analises": [...]}, contendo um objeto no formato acima
+para cada ligação, na mesma ordem em que foram enviadas.
+"""
+
+_SIMPLIFIED_SCHEMA = """\
+Responda de forma estruturada, em formato JSON:
+{
+  "vendedor_identificado": "primeiro nome do vendedor ou NÃO_IDENTIFICADO",
+  "sentimento_geral": "positivo/neutro/negativo",
+  "performance_vendedor": "excelente/boa/regular/ruim",
+  "nota_vendedor": 1 a 10,
+  "resultado_conversa": "venda_fechada/follow_up_agendado/cliente_perdido/indefinido",
+  "nivel_interesse_cliente": "alto/medio/baixo",
+  "resumo_executivo": "O que aconteceu nesta ligação em 2-3 frases",
+  "principal_objecao": "Principal objeção do cliente",
+  "recomendacao_principal": "Principal sugestão para melhorar",
+  "classificacao_ligacao": "A/B/C/D"
+}
+"""
+
+
+def _expand_keys(raw: Dict) -> Dict:
+    """
+    Converte as chaves abreviadas da resposta do modelo para os nomes completos
+    """
+    return {_KEY_MAP.get(key, key): value for key, value in raw.items()}
+
+
+def _normalize_category(value):
+    """
+    Normaliza valores categóricos ("Média " -> "media") antes da validação
+    """
+    if not isinstance(value, str):
+        return value
+    value = unicodedata.normalize("NFKD", value.strip().lower())
+    return "".join(char for char in value if not unicodedata.combining(char))
+
+
+class AnalysisResult(BaseModel):
+    """
+    Esquema da análise completa retornada pelo modelo (após expandir as chaves)
+    
+    Campos ausentes continuam ausentes; campos extras são preservados.
+    """
+    model_config = ConfigDict(extra="allow")
+    
+    sentimento_geral: Literal["positivo", "neutro", "negativo"]
+    nota_vendedor: float = Field(ge=1, le=10)
+    classificacao_ligacao: Literal["A", "B", "C", "D"]
+    
+    score_sentimento: Optional[float] = Field(default=None, ge=-1, le=1)
+    satisfacao_cliente: Optional[Literal["alta", "media", "baixa"]] = None
+    performance_vendedor: Optional[Literal["excelente", "boa", "regular", "ruim"]] = None
+    resultado_conversa: Optional[Literal["venda_fechada", "follow_up_agendado", "cliente_perdido", "indefinido"]] = None
+    nivel_interesse_cliente: Optional[Literal["alto", "medio", "baixo"]] = None
+    urgencia_compra: Optional[Literal["alta", "media", "baixa"]] = None
+    qualidade_ligacao: Optional[Literal["excelente", "boa", "regular", "ruim"]] = None
+    
+    produtos_mencionados: Optional[List[str]] = None
+    objecoes_cliente: Optional[List[str]] = None
+    tecnicas_vendas_usadas: Optional[List[str]] = None
+    pontos_fortes: Optional[List[str]] = None
+    pontos_melhoria: Optional[List[str]] = None
+    proximos_passos: Optional[List[str]] = None
+    palavras_chave: Optional[List[str]] = None
+    oportunidades_perdidas: Optional[List[str]] = None
+    concorrentes_citados: Optional[List[str]] = None
+    recomendacoes_especificas: Optional[List[str]] = None
+    
+    @field_validator("sentimento_geral", "satisfacao_cliente", "performance_vendedor", "resultado_conversa",
+                     "nivel_interesse_cliente", "urgencia_compra", "qualidade_ligacao", mode="before")
+    @classmethod
+    def _normalize_categories(cls, value):
+        return _normalize_category(value)
+    
+    @field_validator("urgencia_compra", "qualidade_ligacao", mode="before")
+    @classmethod
+    def _drop_explanation(cls, value):
+        # O esquema pede "alta/media/baixa - justificativa": só o valor antes do traço é categórico
+        return value.split(" - ", 1)[0].strip() if isinstance(value, str) else value
+    
+    @field_validator("nota_vendedor")
+    @classmethod
+    def _integral_score(cls, value):
+        # Mantém notas inteiras como int, como o restante do pipeline espera
+        return int(value) if value.is_integer() else value
+    
+    @field_validator("classificacao_ligacao", mode="before")
+    @classmethod
+    def _normalize_classification(cls, value):
+        return value.strip().upper()[:1] if isinstance(value, str) else value
+    
+    @field_validator("produtos_mencionados", "objecoes_cliente", "tecnicas_vendas_usadas", "pontos_fortes",
+                     "pontos_melhoria", "proximos_passos", "palavras_chave", "oportunidades_perdidas",
+                     "concorrentes_citados", "recomendacoes_especificas", mode="before")
+    @classmethod
+    def _wrap_single_item(cls, value):
+        return [value] if isinstance(value, str) else value
+
+
+def _validate_analysis(raw: Dict) -> Dict:
+    """
+    Valida e normaliza a análise completa, levantando ValidationError se estiver fora do esquema
+    """
+    return AnalysisResult.model_validate(_expand_keys(raw)).model_dump(exclude_unset=True, exclude_none=True)
+
+
+def _coerce_score(analysis: Dict) -> Dict:
+    """
+    Converte nota_vendedor da análise simplificada (que não passa pela validação completa)
+    para número, como na análise completa ("7,5" -> 7.5); valores que não são uma nota
+    de 1 a 10 são removidos
+    """
+    nota = analysis.get("nota_vendedor")
+    if isinstance(nota, str):
+        try:
+            nota = float(nota.strip().replace(",", "."))
+        except ValueError:
+            nota = None
+    if isinstance(nota, (int, float)) and not isinstance(nota, bool) and 1 <= nota <= 10:
+        analysis["nota_vendedor"] = int(nota) if float(nota).is_integer() else nota
+    else:
+        analysis.pop("nota_vendedor", None)
+    return analysis
 
 
 class VendorAnalysisService:
-    def __init__(self, openai_api_key: str, model_name: str = "gpt-4o-mini"):
-        self.client = OpenAI(api_key=openai_api_key)
+    def __init__(self, openai_api_key: str, model_name: str = "gpt-4o-mini", max_concurrency: int = 16,
+                 cache_dir: Optional[str] = ".llm_cache", triage: bool = False,
+                 escalation_model: Optional[str] = None):
+        self.client = _openai_client(openai_api_key)
         self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        # Roteamento em dois níveis (desativado por padrão: os relatórios usam o esquema completo)
+        self.triage = triage
+        self.escalation_model = escalation_model or model_name
+        # Cache persistente de respostas (None desativa)
+        self.cache = Cache(cache_dir) if cache_dir else None
+    
+    def _cache_key(self, model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int],
+                   as_json: bool) -> str:
+        """
+        Gera a chave do cache a partir do modelo, mensagens e parâmetros da chamada
+        """
+        payload = orjson.dumps([model, messages, temperature, max_tokens, as_json], option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(payload, digest_size=32).hexdigest()
+    
+    def _create_completion(self, messages: List[Dict], temperature: float, max_tokens: Optional[int] = None,
+                           as_json: bool = False, expected_keys: Optional[frozenset] = None,
+                           model: Optional[str] = None):
+        """
+        Executa uma chamada de chat consultando antes o cache de respostas
+        
+        Args:
+            messages: Mensagens enviadas ao modelo
+            temperature: Temperatura da geração
+            max_tokens: Limite de tokens da resposta (opcional)
+            as_json: Decodifica a resposta como JSON
+            expected_keys: Campos aceitos no JSON; se informado, a resposta é recebida em
+                streaming e a chamada é interrompida no primeiro campo desconhecido
+            model: Modelo da chamada (padrão: model_name do serviço)
+            
+        Returns:
+            Texto da resposta, ou dicionário se as_json=True
+        """
+        model = model or self.model_name
+        key = self._cache_key(model, messages, temperature, max_tokens, as_json) if self.cache is not None else None
+        content = self.cache.get(key) if key else None
+        cached = content is not None
+        
+        if not cached:
+            params = {"max_tokens": max_tokens} if max_tokens else {}
+            if as_json:
+                # Modo JSON garante um objeto válido, sem marcadores de código
+                params["response_format"] = {"type": "json_object"}
+            if as_json and expected_keys:
+                content = self._stream_json_completion(model, messages, temperature, params, expected_keys)
+            else:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    **params
+                )
+                content = response.choices[0].message.content.strip()
+        
+        # Respostas JSON só entram no cache depois de decodificadas com sucesso
+        result = orjson.loads(content) if as_json else content
+        
+        if key and not cached:
+            self.cache.set(key, content)
+        
+        return result
+    
+    def _stream_json_completion(self, model: str, messages: List[Dict], temperature: float, params: Dict,
+                                expected_keys: frozenset) -> str:
+        """
+        Recebe a resposta em streaming validando os campos do JSON à medida que chegam
+        
+        Args:
+            model: Modelo da chamada
+            messages: Mensagens enviadas ao modelo
+            temperature: Temperatura da geração
+            params: Parâmetros adicionais da chamada
+            expected_keys: Campos aceitos no objeto de primeiro nível
+            
+        Returns:
+            Texto completo da resposta
+            
+        Raises:
+            ValueError: Se o modelo gerar um campo fora do esquema
+        """
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            **params
+        )
+        
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events)
+        parts = []
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                parser.send(delta.encode("utf-8"))
+                for prefix, event, value in events:
+                    # Campo desconhecido indica resposta fora do esquema: aborta sem esperar o fim da geração
+                    if prefix == "" and event == "map_key" and value not in expected_keys:
+                        raise ValueError(f"Campo inesperado na resposta: {value}")
+                del events[:]
+            parser.close()
+        finally:
+            # Fecha a conexão caso o streaming tenha sido interrompido
+            response = getattr(stream, "response", None)
+            if response is not None:
+                response.close()
+        
+        return "".join(parts).strip()
     
     def extract_vendor_name(self, transcription_text: str) -> Optional[str]:
         """
@@ -24,8 +458,13 @@ class VendorAnalysisService:
             Nome do vendedor ou None se não encontrado
         """
         try:
-            # Pega os primeiros 500 caracteres da transcrição
-            inicio_transcricao = transcription_text[:500]
+            # Pega o início da transcrição, limitado em tokens
+            inicio_transcricao = self._head_tokens(transcription_text, VENDOR_HEAD_TOKENS)
+            
+            # A maioria das apresentações segue padrões fixos: só recorre ao LLM se o regex falhar
+            vendor_name = self._match_vendor_name(inicio_transcricao)
+            if vendor_name:
+                return vendor_name
             
             prompt = f"""
             Analise o início desta transcrição de uma ligação de vendas e identifique o nome do vendedor.
@@ -42,8 +481,7 @@ class VendorAnalysisService:
             Exemplos de resposta: "João", "Maria", "Ana", "NÃO_IDENTIFICADO"
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model_name,
+            vendor_name = self._create_completion(
                 messages=[
                     {"role": "system", "content": "Você é especialista em identificar nomes de vendedores em transcrições de ligações. Responda sempre com apenas o primeiro nome ou 'NÃO_IDENTIFICADO'."},
                     {"role": "user", "content": prompt}
@@ -52,187 +490,255 @@ class VendorAnalysisService:
                 max_tokens=50
             )
             
-            vendor_name = response.choices[0].message.content.strip()
-            
-            # Limpa e valida o nome
-            if vendor_name and vendor_name != "NÃO_IDENTIFICADO":
-                # Remove caracteres especiais e mantém apenas letras
-                vendor_name = re.sub(r'[^a-zA-ZÀ-ÿ]', '', vendor_name)
-                if len(vendor_name) >= 2:  # Nome deve ter pelo menos 2 caracteres
-                    return vendor_name.capitalize()
+            return self._clean_vendor_name(vendor_name)
             
+        except Exception as e:
+            logger.error("❌ Erro ao extrair nome do vendedor: %s", e)
             return None
+    
+    def _match_vendor_name(self, text: str) -> Optional[str]:
+        """
+        Procura o nome do vendedor nas frases de apresentação usuais, sem chamar o LLM
+        
+        Args:
+            text: Trecho inicial da transcrição
             
-        except Exception as e:
-            print(f"❌ Erro ao extrair nome do vendedor: {str(e)}")
+        Returns:
+            Primeiro nome do vendedor ou None se nenhum padrão for encontrado
+        """
+        for match in _VENDOR_RX.finditer(text):
+            name = match.group(1)
+            if name not in _VENDOR_RX_STOPWORDS:
+                return name.capitalize()
+        return None
+    
+    def _clean_vendor_name(self, vendor_name: Optional[str]) -> Optional[str]:
+        """
+        Limpa e valida o nome do vendedor retornado pelo modelo
+        """
+        if not isinstance(vendor_name, str):
             return None
+        
+        vendor_name = vendor_name.strip().strip('"')
+        
+        # Limpa e valida o nome
+        if vendor_name and vendor_name != "NÃO_IDENTIFICADO":
+            # Remove caracteres especiais e mantém apenas letras
+            vendor_name = _NAME_CLEAN_RX.sub('', vendor_name)
+            if len(vendor_name) >= 2:  # Nome deve ter pelo menos 2 caracteres
+                return vendor_name.capitalize()
+        
+        return None
+    
+    def _count_tokens(self, text: str) -> int:
+        """
+        Conta (ou estima) os tokens de um texto para o modelo configurado
+        """
+        encoding = _get_encoding(self.model_name)
+        if encoding is None:
+            return len(text) // CHARS_PER_TOKEN
+        return len(encoding.encode(text))
+    
+    def _head_tokens(self, text: str, max_tokens: int) -> str:
+        """
+        Retorna o início do texto com no máximo max_tokens tokens
+        
+        Args:
+            text: Texto de origem
+            max_tokens: Quantidade máxima de tokens
+            
+        Returns:
+            Prefixo do texto cortado em fronteira de token
+        """
+        # Codifica só um prefixo com folga (o dobro da média de caracteres por token), não o texto inteiro
+        head = text[:max_tokens * CHARS_PER_TOKEN * 2]
+        encoding = _get_encoding(self.model_name)
+        if encoding is None:
+            return head[:max_tokens * CHARS_PER_TOKEN]
+        
+        tokens = encoding.encode(head)
+        if len(tokens) <= max_tokens and len(head) == len(text):
+            return text
+        # Tokens que dividem um caractere acentuado ao meio são descartados
+        return encoding.decode(tokens[:max_tokens]).rstrip("\ufffd")
+    
+    def _map_chunks(self, text: str) -> Iterator[str]:
+        """
+        Divide o texto em janelas de CHUNK_TOKENS tokens com sobreposição
+        """
+        encoding = _get_encoding(self.model_name)
+        if encoding is None:
+            units, size, overlap = text, CHUNK_TOKENS * CHARS_PER_TOKEN, CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN
+        else:
+            units, size, overlap = encoding.encode(text), CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+        
+        step = size - overlap
+        for start in range(0, len(units), step):
+            window = units[start:start + size]
+            yield window if encoding is None else encoding.decode(window)
+            if start + size >= len(units):
+                break
     
-    def analyze_sales_conversation(self, transcription_text: str, vendor_name: str = None, file_name: str = None) -> Dict:
+    def _extract_chunk_facts(self, chunk: str, index: int, total: int) -> List[str]:
+        """
+        Etapa "map": extrai fatos relevantes de um trecho da transcrição
+        """
+        prompt = f"""
+            Este é o trecho {index}/{total} da transcrição de uma ligação de vendas do sistema VVN (Vivo Voz Negócio).
+            Extraia apenas fatos objetivos úteis para avaliar a venda: apresentação do vendedor, necessidades e perfil do cliente,
+            produtos e valores citados, objeções, técnicas de venda usadas, concorrentes, compromissos e próximos passos.
+
+            TRECHO:
+            {chunk}
+
+            Responda em JSON no formato: {{"fatos": ["fato 1", "fato 2"]}}
+            """
+        
+        facts = self._create_completion(
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=600,
+            as_json=True
+        )
+        
+        return [fact for fact in facts.get("fatos", []) if isinstance(fact, str)]
+    
+    def _summarize_long_transcription(self, transcription_text: str) -> str:
+        """
+        Reduz uma transcrição longa aos fatos extraídos de cada trecho, em paralelo
+        """
+        chunks = list(self._map_chunks(transcription_text))
+        total = len(chunks)
+        logger.info("✂️ Transcrição longa dividida em %d trecho(s) para análise", total)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, total))) as executor:
+            facts_per_chunk = list(executor.map(
+                self._extract_chunk_facts, chunks, range(1, total + 1), [total] * total
+            ))
+        
+        return "\n".join(
+            f"Trecho {index}:\n" + "\n".join(f"- {fact}" for fact in facts)
+            for index, facts in enumerate(facts_per_chunk, 1)
+        )
+    
+    def analyze_sales_conversation(self, transcription_text: str, vendor_name: str = None, file_name: str = None,
+                                   timestamp: Optional[str] = None) -> Dict:
         """
         Analisa uma conversa de vendas e extrai insights detalhados
         
         Args:
             transcription_text: Texto da transcrição
-            vendor_name: Nome do vendedor (opcional)
+            vendor_name: Nome do vendedor (opcional; se omitido, é identificado pela própria análise)
             file_name: Nome do arquivo original (opcional)
+            timestamp: Momento da análise em ISO 8601 (opcional; padrão: agora)
             
         Returns:
             Dicionário com análise completa da conversa
         """
+        timestamp = timestamp or datetime.now().isoformat()
         try:
-            print(f"🧠 Analisando conversa de vendas...")
+            logger.info("🧠 Analisando conversa de vendas...")
             
-            prompt = f"""
-            Você é um especialista em análise de vendas com 20 anos de experiência. Analise esta transcrição de uma ligação de vendas do sistema VVN (Vivo Voz Negócio) e forneça insights práticos e acionáveis.
-
-            TRANSCRIÇÃO DA LIGAÇÃO:
-            {transcription_text}
-
-            INSTRUÇÕES PARA ANÁLISE:
-            1. Identifique claramente quem é o VENDEDOR e quem é o CLIENTE na conversa
-            2. Analise o comportamento, técnicas e performance do vendedor
-            3. Avalie as reações, objeções e interesse do cliente
-            4. Foque em insights que podem melhorar as vendas futuras
-            5. Seja específico e prático nas suas observações
-
-            Forneça sua análise em formato JSON com estas informações específicas:
-
-            {{
-              "sentimento_geral": "positivo/neutro/negativo",
-              "score_sentimento": -1.0 a 1.0,
-              "satisfacao_cliente": "alta/media/baixa",
-              "performance_vendedor": "excelente/boa/regular/ruim",
-              "nota_vendedor": 1 a 10,
-              
-              "produtos_mencionados": ["liste produtos/serviços específicos mencionados"],
-              
-              "objecoes_cliente": ["liste objeções específicas do cliente como: preço alto, não precisa agora, etc."],
-              
-              "tecnicas_vendas_usadas": ["identifique técnicas como: rapport, descoberta de necessidades, apresentação de benefícios, fechamento, etc."],
-              
-              "pontos_fortes": ["o que o vendedor fez bem: escuta ativa, argumentação convincente, etc."],
-              
-              "pontos_melhoria": ["o que o vendedor pode melhorar: não interrompeu cliente, não perguntou sobre orçamento, etc."],
-              
-              "resultado_conversa": "venda_fechada/follow_up_agendado/cliente_perdido/indefinido",
-              
-              "proximos_passos": ["ações específicas recomendadas: ligar em X dias, enviar proposta, agendar visita, etc."],
-              
-              "palavras_chave": ["termos importantes mencionados pelo cliente"],
-              
-              "duracao_estimada": "X minutos",
-              
-              "nivel_interesse_cliente": "alto/medio/baixo",
-              
-              "resumo_executivo": "Resumo de 2-3 frases explicando o que aconteceu na ligação e o resultado",
-              
-              "momento_critico": "Identifique o momento mais importante da conversa (quando cliente demonstrou interesse, fez objeção principal, etc.)",
-              
-              "oportunidades_perdidas": ["o que o vendedor poderia ter feito diferente para melhorar o resultado"],
-              
-              "cliente_perfil": "Descreva brevemente o perfil do cliente (empresa pequena/média/grande, setor, necessidades)",
-              
-              "valor_mencionado": "Se algum valor/preço foi mencionado na conversa",
-              
-              "concorrentes_citados": ["se outros fornecedores foram mencionados"],
-              
-              "urgencia_compra": "alta/media/baixa - baseado na necessidade demonstrada pelo cliente",
-              
-              "qualidade_ligacao": "excelente/boa/regular/ruim - considerando clareza da conversa",
-              
-              "recomendacoes_especificas": ["sugestões práticas para este vendedor melhorar em próximas ligações"],
-              
-              "classificacao_ligacao": "A/B/C/D - onde A=excelente, B=boa, C=regular, D=ruim"
-            }}
-
-            IMPORTANTE: 
-            - Seja específico e prático nas suas observações
-            - Base suas conclusões apenas no que está na transcrição
-            - Se algo não estiver claro na transcrição, indique "não identificado"
-            - Foque em insights que ajudem a melhorar vendas futuras
-            - A nota do vendedor deve ser de 1 a 10, considerando técnicas, resultado e profissionalismo
-            - Responda APENAS com o JSON válido, sem texto adicional
-            """
+            # Com triagem ativa, ligações curtas de classificação baixa ficam só com o esquema simplificado
+            if self.triage and len(transcription_text) <= TRIAGE_MAX_CHARS:
+                triage = self._quick_triage(transcription_text)
+                if triage.get("classificacao_ligacao") not in TRIAGE_ESCALATE_CLASSES:
+                    self._finalize_analysis(triage, transcription_text, vendor_name, file_name, timestamp)
+                    triage["tipo_analise"] = "triagem"
+                    logger.info("✅ Triagem concluída - Classificação: %s", triage.get('classificacao_ligacao', 'N/A'))
+                    return triage
             
-            response = self.client.chat.completions.create(
-                model=self.model_name,
+            # Transcrições longas passam por map-reduce: só os fatos extraídos
+            # de cada trecho entram no prompt principal
+            conversation_label = "TRANSCRIÇÃO"
+            conversation_text = transcription_text
+            is_long = self._count_tokens(transcription_text) > MAP_REDUCE_THRESHOLD_TOKENS
+            if is_long:
+                conversation_label = "FATOS EXTRAÍDOS"
+                conversation_text = self._summarize_long_transcription(transcription_text)
+            
+            analysis = self._create_completion(
                 messages=[
-                    {"role": "system", "content": "Você é um especialista em análise de vendas. Analise conversas comerciais e forneça insights práticos e acionáveis para melhorar performance de vendas. Sempre responda em JSON válido."},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": f"{_ANALYSIS_SCHEMA}\n{conversation_label}:\n{conversation_text}"}
                 ],
                 temperature=0.2,
-                max_tokens=2500
+                max_tokens=2500,
+                as_json=True,
+                expected_keys=_ANALYSIS_KEYS,
+                model=self.escalation_model if self.triage else None
             )
+            # Resposta fora do esquema vai direto para a análise simplificada
+            analysis = _validate_analysis(analysis)
             
-            analysis_text = response.choices[0].message.content.strip()
-            
-            # Limpa possíveis marcadores de código
-            if analysis_text.startswith("```json"):
-                analysis_text = analysis_text[7:]
-            if analysis_text.endswith("```"):
-                analysis_text = analysis_text[:-3]
+            self._finalize_analysis(analysis, transcription_text, vendor_name, file_name, timestamp,
+                                    model=self.escalation_model if self.triage else None)
+            if is_long:
+                analysis["tipo_analise"] = "map_reduce"
             
-            analysis = json.loads(analysis_text)
-            
-            # Adiciona metadados
-            analysis["vendedor"] = vendor_name or "Não identificado"
-            analysis["arquivo_origem"] = file_name or "Não informado"
-            analysis["timestamp_analise"] = datetime.now().isoformat()
-            analysis["modelo_usado"] = self.model_name
-            analysis["tamanho_transcricao"] = len(transcription_text)
-            
-            print(f"✅ Análise concluída - Sentimento: {analysis.get('sentimento_geral', 'N/A')} | Nota: {analysis.get('nota_vendedor', 'N/A')}")
+            logger.info("✅ Análise concluída - Sentimento: %s | Nota: %s",
+                        analysis.get('sentimento_geral', 'N/A'), analysis.get('nota_vendedor', 'N/A'))
             return analysis
             
-        except json.JSONDecodeError as e:
-            print(f"❌ Erro ao decodificar JSON da análise: {str(e)}")
-            return self._fallback_analysis(transcription_text, vendor_name, file_name)
+        except orjson.JSONDecodeError as e:
+            logger.error("❌ Erro ao decodificar JSON da análise: %s", e)
+            return self._fallback_analysis(transcription_text, vendor_name, file_name, timestamp)
         except Exception as e:
-            print(f"❌ Erro na análise: {str(e)}")
-            return self._fallback_analysis(transcription_text, vendor_name, file_name)
+            logger.error("❌ Erro na análise: %s", e)
+            return self._fallback_analysis(transcription_text, vendor_name, file_name, timestamp)
     
-    def _fallback_analysis(self, transcription_text: str, vendor_name: str = None, file_name: str = None) -> Dict:
+    def _finalize_analysis(self, analysis: Dict, transcription_text: str, vendor_name: str = None,
+                           file_name: str = None, timestamp: Optional[str] = None,
+                           model: Optional[str] = None) -> Dict:
+        """
+        Resolve o vendedor e adiciona os metadados a uma análise completa
+        """
+        # Usa o vendedor identificado na própria análise quando não informado,
+        # recorrendo aos padrões de apresentação se o modelo não o encontrou
+        identified_vendor = (self._clean_vendor_name(analysis.pop("vendedor_identificado", None))
+                             or self._match_vendor_name(self._head_tokens(transcription_text, VENDOR_HEAD_TOKENS)))
+        
+        # Adiciona metadados
+        analysis["vendedor"] = vendor_name or identified_vendor or "Não identificado"
+        analysis["arquivo_origem"] = file_name or "Não informado"
+        analysis["timestamp_analise"] = timestamp or datetime.now().isoformat()
+        analysis["modelo_usado"] = model or self.model_name
+        analysis["tamanho_transcricao"] = len(transcription_text)
+        return analysis
+    
+    def _quick_triage(self, transcription_text: str) -> Dict:
+        """
+        Executa a análise no esquema simplificado, mais barato que o completo
+        
+        Args:
+            transcription_text: Texto da transcrição
+            
+        Returns:
+            Dicionário com a análise simplificada, sem metadados
+        """
+        return _coerce_score(self._create_completion(
+            messages=[
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": f"{_SIMPLIFIED_SCHEMA}\nTRANSCRIÇÃO:\n{transcription_text}"}
+            ],
+            temperature=0.3,
+            as_json=True
+        ))
+    
+    def _fallback_analysis(self, transcription_text: str, vendor_name: str = None, file_name: str = None,
+                           timestamp: Optional[str] = None) -> Dict:
         """
         Análise simplificada em caso de falha na análise principal
         """
+        timestamp = timestamp or datetime.now().isoformat()
         try:
-            print("🔄 Tentando análise simplificada...")
-            
-            prompt = f"""
-            Analise esta conversa de vendas e responda de forma estruturada:
-
-            CONVERSA: {transcription_text[:2000]}...
-
-            Responda em formato JSON:
-            {{
-              "sentimento_geral": "positivo/neutro/negativo",
-              "performance_vendedor": "excelente/boa/regular/ruim",
-              "nota_vendedor": 1 a 10,
-              "resultado_conversa": "venda_fechada/follow_up_agendado/cliente_perdido/indefinido",
-              "nivel_interesse_cliente": "alto/medio/baixo",
-              "resumo_executivo": "O que aconteceu nesta ligação em 2-3 frases",
-              "principal_objecao": "Principal objeção do cliente",
-              "recomendacao_principal": "Principal sugestão para melhorar",
-              "classificacao_ligacao": "A/B/C/D"
-            }}
-            """
+            logger.info("🔄 Tentando análise simplificada...")
             
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            analysis_text = response.choices[0].message.content.strip()
-            if analysis_text.startswith("```json"):
-                analysis_text = analysis_text[7:]
-            if analysis_text.endswith("```"):
-                analysis_text = analysis_text[:-3]
-            
-            analysis = json.loads(analysis_text)
-            analysis["vendedor"] = vendor_name or "Não identificado"
+            analysis = self._quick_triage(self._head_tokens(transcription_text, FALLBACK_HEAD_TOKENS))
+            identified_vendor = self._clean_vendor_name(analysis.pop("vendedor_identificado", None))
+            analysis["vendedor"] = vendor_name or identified_vendor or "Não identificado"
             analysis["arquivo_origem"] = file_name or "Não informado"
-            analysis["timestamp_analise"] = datetime.now().isoformat()
+            analysis["timestamp_analise"] = timestamp
             analysis["tipo_analise"] = "simplificada"
             
             return analysis
@@ -242,7 +748,7 @@ class VendorAnalysisService:
                 "erro": f"Falha completa na análise: {str(e)}",
                 "vendedor": vendor_name or "Não identificado",
                 "arquivo_origem": file_name or "Não informado",
-                "timestamp_analise": datetime.now().isoformat(),
+                "timestamp_analise": timestamp,
                 "sentimento_geral": "indefinido",
                 "performance_vendedor": "indefinido",
                 "nota_vendedor": 0,
@@ -260,33 +766,138 @@ class VendorAnalysisService:
         Returns:
             Lista de análises completas
         """
-        results = []
-        total_transcriptions = len(transcriptions)
+        logger.info("🚀 Iniciando análise de %d conversa(s)...", len(transcriptions))
+        return list(self.iter_analyze_multiple_conversations(transcriptions))
+    
+    def iter_analyze_multiple_conversations(self, transcriptions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Analisa múltiplas conversas entregando cada resultado assim que estiver pronto
         
-        print(f"🚀 Iniciando análise de {total_transcriptions} conversa(s)...")
+        As transcrições são consumidas sob demanda e só uma janela limitada de análises
+        fica em memória, para que o chamador possa persistir os resultados aos poucos.
         
-        for i, transcription in enumerate(transcriptions, 1):
-            print(f"\n📊 Analisando conversa {i}/{total_transcriptions}: {transcription.get('arquivo_origem', 'N/A')}")
+        Args:
+            transcriptions: Transcrições com metadados (lista ou qualquer iterável)
             
-            # Extrai nome do vendedor se não fornecido
-            vendor_name = self.extract_vendor_name(transcription['texto'])
+        Returns:
+            Iterador de análises completas, na mesma ordem das transcrições
+        """
+        # Todas as análises do lote compartilham o mesmo horário
+        timestamp = datetime.now().isoformat()
+        window = 2 * max(1, self.max_concurrency)
+        
+        # Conversas curtas são agrupadas em lotes; as demais seguem uma por chamada.
+        # As chamadas à OpenAI são dominadas pela latência de rede, então os
+        # grupos são analisados em paralelo com concorrência limitada
+        pending = deque()
+        ready = {}
+        next_index = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            groups = self._group_transcriptions(transcriptions)
+            while True:
+                for group in groups:
+                    pending.append((group, executor.submit(self._analyze_group, group, timestamp)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                
+                # Um lote de conversas curtas só é enviado quando fecha, então pode
+                # ficar atrás de conversas longas: os resultados aguardam em "ready"
+                # até chegar a sua vez
+                group, future = pending.popleft()
+                ready.update(zip((index for index, _ in group), future.result()))
+                while next_index in ready:
+                    yield ready.pop(next_index)
+                    next_index += 1
+        
+        logger.info("🎉 Análise concluída! %d conversa(s) analisada(s).", next_index)
+    
+    def _group_transcriptions(self, transcriptions: Iterable[Dict]) -> Iterator[List[tuple]]:
+        """
+        Agrupa as transcrições curtas em lotes limitados por tokens e quantidade
+        
+        Returns:
+            Iterador de grupos com pares (índice original, transcrição)
+        """
+        batch, batch_tokens = [], 0
+        for index, transcription in enumerate(transcriptions):
+            text = transcription['texto']
+            if len(text) >= SHORT_TRANSCRIPTION_CHARS:
+                yield [(index, transcription)]
+                continue
             
-            # Analisa a conversa
-            analysis = self.analyze_sales_conversation(
-                transcription['texto'],
-                vendor_name,
-                transcription.get('arquivo_origem')
+            tokens = self._count_tokens(text)
+            if batch and (batch_tokens + tokens > BATCH_MAX_TOKENS or len(batch) >= BATCH_MAX_CALLS):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append((index, transcription))
+            batch_tokens += tokens
+        
+        if batch:
+            yield batch
+    
+    def _analyze_group(self, group: List[tuple], timestamp: Optional[str] = None) -> List[Dict]:
+        """
+        Analisa um grupo de transcrições, em lote quando houver mais de uma
+        """
+        if len(group) == 1:
+            return [self._analyze_transcription(group[0][1], timestamp)]
+        
+        transcriptions = [transcription for _, transcription in group]
+        logger.info("📦 Analisando lote de %d conversa(s) curta(s)", len(transcriptions))
+        
+        try:
+            calls = "\n\n".join(
+                f"LIGAÇÃO [{number}]:\n{transcription['texto']}"
+                for number, transcription in enumerate(transcriptions, 1)
+            )
+            response = self._create_completion(
+                messages=[
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": f"{_BATCH_SCHEMA}\n{calls}"}
+                ],
+                temperature=0.2,
+                max_tokens=2500 * len(transcriptions),
+                as_json=True,
+                expected_keys=frozenset({"analises"})
             )
             
-            # Adiciona dados da transcrição original
-            result = {
-                "transcricao": transcription,
-                "analise": analysis
-            }
+            analyses = response.get("analises")
+            if not isinstance(analyses, list) or not all(isinstance(a, dict) for a in analyses):
+                raise ValueError("Resposta do lote sem a lista de análises")
+            if len(analyses) != len(transcriptions):
+                raise ValueError("Resposta do lote não corresponde às ligações enviadas")
+            analyses = [_validate_analysis(analysis) for analysis in analyses]
             
-            results.append(result)
-            print(f"✅ Análise concluída ({i}/{total_transcriptions})")
+        except Exception as e:
+            # Sem uma análise válida por ligação, cada conversa é analisada individualmente
+            logger.warning("⚠️ Falha na análise em lote, analisando individualmente: %s", e)
+            return [self._analyze_transcription(transcription, timestamp) for transcription in transcriptions]
         
-        print(f"\n🎉 Análise concluída! {len(results)} conversa(s) analisada(s).")
+        results = []
+        for transcription, analysis in zip(transcriptions, analyses):
+            self._finalize_analysis(analysis, transcription['texto'], file_name=transcription.get('arquivo_origem'),
+                                    timestamp=timestamp)
+            analysis["tipo_analise"] = "lote"
+            results.append({"transcricao": transcription, "analise": analysis})
         return results
-
+    
+    def _analyze_transcription(self, transcription: Dict, timestamp: Optional[str] = None) -> Dict:
+        """
+        Analisa uma única transcrição (o vendedor é identificado na mesma chamada)
+        """
+        logger.info("📊 Analisando conversa: %s", transcription.get('arquivo_origem', 'N/A'))
+        
+        # Analisa a conversa
+        analysis = self.analyze_sales_conversation(
+            transcription['texto'],
+            file_name=transcription.get('arquivo_origem'),
+            timestamp=timestamp
+        )
+        
+        # Adiciona dados da transcrição original
+        return {
+            "transcricao": transcription,
+            "analise": analysis
+        }
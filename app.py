@@ -1,12 +1,28 @@
 """
 Aplicação Flask Principal - VVN AI Analyzer
 """
+import atexit
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
 import os
+import queue
 import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+from diskcache import Cache
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import BaseTarget, ValueTarget
 from werkzeug.utils import secure_filename
 
 # Importa serviços
@@ -14,10 +30,51 @@ from transcription_service import AssemblyAITranscriptionService
 from analysis_service import VendorAnalysisService
 from vendor_grouping_service import VendorGroupingService
 from classification_service import CallClassificationService
-from report_generator import WordReportGenerator
+from report_generator import render_report
+
+logger = logging.getLogger(__name__)
+
+def configure_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    Envia os logs dos serviços por uma fila, escrita no terminal por uma thread dedicada,
+    para que as threads de análise não disputem o stdout
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(message)s"))
+    
+    handler = QueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    listeners = []
+    
+    def start_listener():
+        # Fila e listener novos: o listener herdado de um fork não tem a sua thread e
+        # não pode ser reiniciado (o Python 3.14 recusa start() com a thread já definida)
+        if listeners:
+            atexit.unregister(listeners.pop().stop)
+        handler.queue = queue.SimpleQueue()
+        listener = QueueListener(handler.queue, console, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        listeners.append(listener)
+        return listener
+    
+    listener = start_listener()
+    
+    # Com preload_app no gunicorn os workers nascem de um fork feito depois deste
+    # ponto e não herdam a thread do listener: cada processo filho cria o seu
+    os.register_at_fork(after_in_child=start_listener)
+    return listener
+
+configure_logging()
 
 app = Flask(__name__)
-CORS(app)  # Permite requisições de qualquer origem
+# Permite requisições de qualquer origem apenas nas rotas da API; as demais
+# (página inicial, /health) não passam pelo hook do CORS
+CORS(app, resources={r"/process": {"origins": "*"},
+                     r"/status/*": {"origins": "*"},
+                     r"/download/*": {"origins": "*"}})
 
 # Configurações
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
@@ -25,16 +82,250 @@ app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
 
 # Extensões de arquivo permitidas
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'flac', 'ogg', 'aac'}
+ALLOWED_SUFFIXES = tuple(f".{extension}" for extension in sorted(ALLOWED_EXTENSIONS))
+
+# Tamanho dos blocos lidos do corpo da requisição durante o upload
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Paralelismo de cada etapa, ajustável por variável de ambiente conforme os
+# limites de requisições do AssemblyAI e da OpenAI
+# Transcrições simultâneas no AssemblyAI por requisição
+TRANSCRIPTION_WORKERS = int(os.environ.get('TRANSCRIPTION_WORKERS', 8))
+# Chamadas simultâneas à OpenAI por requisição
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 16))
+
+# Cache de transcrições por conteúdo do áudio: reenvios do mesmo arquivo não passam pelo AssemblyAI
+ASR_CACHE_DIR = '.asr_cache'
+ASR_CACHE_TTL = 30 * 24 * 60 * 60  # 30 dias
+
+# Estatísticas e insights por vendedor: reprocessar as mesmas análises não recalcula o vendedor
+VENDOR_CACHE_DIR = '.vendor_cache'
+VENDOR_CACHE_TTL = 7 * 24 * 60 * 60  # 7 dias
+
+# Relatórios e arquivos de status ficam disponíveis por este tempo; além disso,
+# os mais antigos são removidos quando o total passa do limite de espaço
+REPORT_TTL = int(os.environ.get('REPORT_TTL_HOURS', 6)) * 60 * 60
+REPORTS_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+JANITOR_INTERVAL = 5 * 60  # 5 minutos
+
+# Processamentos executados em segundo plano ao mesmo tempo; os demais aguardam na fila
+PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', 2))
+pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS)
+
+# Uploads repassados ao AssemblyAI enquanto o navegador ainda envia o arquivo.
+# A fila limita os blocos em memória por arquivo (cada bloco tem até UPLOAD_CHUNK_SIZE)
+FORWARD_WORKERS = 8
+FORWARD_QUEUE_CHUNKS = 4
+forward_executor = ThreadPoolExecutor(max_workers=FORWARD_WORKERS)
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_SUFFIXES)
 
-@app.route('/')
-def index():
+def remove_files(paths):
     """
-    Página inicial
+    Remove arquivos temporários, ignorando os que já não existem
     """
-    return """
+    for path in paths:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+class AudioUploadTarget(BaseTarget):
+    """
+    Recebe cada arquivo de áudio do formulário à medida que os bytes chegam,
+    calculando o SHA-256 do conteúdo no mesmo passo
+    
+    Se a chave do AssemblyAI já foi recebida (o formulário a envia antes dos áudios),
+    os bytes seguem direto para o upload no AssemblyAI, sem passar pelo disco.
+    Caso contrário são gravados em um diretório exclusivo da requisição. Em ambos
+    os casos o arquivo é identificado pelo hash do conteúdo, que também serve de
+    chave do cache de transcrições.
+    """
+    def __init__(self, upload_folder, key_target=None):
+        super().__init__()
+        self.upload_folder = upload_folder
+        self.key_target = key_target
+        self.upload_dir = None
+        self.received_files = 0
+        self.paths = []
+        self.digests = {}
+        self.audio_urls = {}
+        self._file = None
+        self._hash = None
+        self._part_path = None
+        self._filename = None
+        self._chunks = None
+        self._upload = None
+    
+    def on_start(self):
+        filename = self.multipart_filename or ''
+        if filename:
+            self.received_files += 1
+        
+        # Arquivos com extensão não permitida são descartados
+        if not filename or not allowed_file(filename):
+            return
+        self._filename = secure_filename(filename)
+        self._hash = hashlib.sha256()
+        
+        api_key = self.key_target.value.decode('utf-8').strip() if self.key_target else ''
+        if api_key:
+            self._chunks = queue.Queue(maxsize=FORWARD_QUEUE_CHUNKS)
+            self._upload = forward_executor.submit(get_transcription_service(api_key).upload_audio_stream,
+                                                   iter(self._chunks.get, None), self._filename)
+            return
+        
+        if self.upload_dir is None:
+            self.upload_dir = tempfile.mkdtemp(prefix='vvn_upload_', dir=self.upload_folder)
+        self._part_path = os.path.join(self.upload_dir, f"{self.received_files}.part")
+        self._file = open(self._part_path, 'wb')
+    
+    def on_data_received(self, chunk):
+        if self._upload:
+            self._hash.update(chunk)
+            self._forward(chunk)
+        elif self._file:
+            self._file.write(chunk)
+            self._hash.update(chunk)
+    
+    def on_finish(self):
+        if self._upload:
+            self._forward(None)
+            audio_url = self._upload.result()
+            self._upload = self._chunks = None
+            if audio_url:
+                self._add(os.path.join(self.upload_folder, self._name()), audio_url)
+            return
+        
+        if not self._file:
+            return
+        self._file.close()
+        self._file = None
+        
+        path = os.path.join(self.upload_dir, self._name())
+        if path in self.digests:
+            # Mesmo áudio enviado duas vezes na requisição: mantém uma única cópia
+            remove_files([self._part_path])
+        else:
+            os.replace(self._part_path, path)
+            self._add(path)
+    
+    def _name(self):
+        return f"{self._hash.hexdigest()[:16]}_{self._filename}"
+    
+    def _add(self, path, audio_url=None):
+        if path in self.digests:
+            return
+        self.paths.append(path)
+        self.digests[path] = self._hash.hexdigest()
+        if audio_url:
+            self.audio_urls[path] = audio_url
+    
+    def _forward(self, chunk):
+        # Aguarda espaço na fila (o upload para o AssemblyAI dita o ritmo); se o
+        # upload já terminou com erro, os blocos restantes são descartados
+        while not self._upload.done():
+            try:
+                self._chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                continue
+    
+    @property
+    def in_progress(self):
+        # Arquivo iniciado e não concluído: o corpo terminou antes do fim da parte
+        return self._upload is not None or self._file is not None
+    
+    def discard(self):
+        """
+        Fecha e remove os arquivos já gravados, encerrando um upload em andamento
+        """
+        if self._upload:
+            self._forward(None)
+            self._upload = self._chunks = None
+        if self._file:
+            self._file.close()
+            self._file = None
+            remove_files([self._part_path])
+        remove_files(path for path in self.paths if path not in self.audio_urls)
+        self.paths = []
+        self.digests = {}
+        self.audio_urls = {}
+        if self.upload_dir:
+            with contextlib.suppress(OSError):
+                os.rmdir(self.upload_dir)
+            self.upload_dir = None
+
+# Serviços sem estado por requisição: criados uma única vez por processo
+GROUPING_SERVICE = VendorGroupingService(VENDOR_CACHE_DIR, cache_ttl=VENDOR_CACHE_TTL)
+CLASSIFICATION_SERVICE = CallClassificationService()
+
+@lru_cache(maxsize=32)
+def get_transcription_service(api_key):
+    # Reenvios com a mesma chave reaproveitam o serviço e suas conexões
+    return AssemblyAITranscriptionService(api_key)
+
+@lru_cache(maxsize=32)
+def get_analysis_service(api_key):
+    return VendorAnalysisService(api_key, max_concurrency=ANALYSIS_WORKERS)
+
+@lru_cache(maxsize=None)
+def get_report_pool():
+    # A geração do .docx é CPU-bound: roda em processos próprios para não disputar o
+    # GIL com as threads que atendem requisições. Criado sob demanda em cada worker
+    # e com "spawn", pois o fork de um processo com threads não é seguro
+    return ProcessPoolExecutor(max_workers=max(1, min(PIPELINE_WORKERS, os.cpu_count() or 1)),
+                               mp_context=multiprocessing.get_context('spawn'))
+
+@lru_cache(maxsize=None)
+def get_asr_cache():
+    # Aberto sob demanda em cada processo, nunca herdado de um fork
+    return Cache(ASR_CACHE_DIR)
+
+def transcribe_with_cache(transcription_service, audio_path, digest=None, audio_url=None):
+    """
+    Transcreve um arquivo reaproveitando o resultado de um áudio idêntico já transcrito
+    
+    audio_url indica um áudio já enviado ao AssemblyAI durante o upload, sem arquivo local.
+    """
+    # O hash normalmente já vem calculado durante o upload
+    if digest is None:
+        with open(audio_path, 'rb') as f:
+            # Leitura em blocos em vez de hashlib.file_digest, que só existe no Python 3.11+
+            hasher = hashlib.sha256()
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+    
+    cache = get_asr_cache()
+    key = f"asr:{digest}"
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("♻️ Transcrição reaproveitada do cache: %s", os.path.basename(audio_path))
+        return {**cached, 'arquivo_origem': os.path.basename(audio_path), 'caminho_completo': audio_path}
+    
+    result = transcription_service.transcribe_audio_file(audio_path, audio_url=audio_url)
+    if result:
+        cache.set(key, result, expire=ASR_CACHE_TTL)
+    return result
+
+def iter_transcriptions(transcription_service, audio_files, digests=None, audio_urls=None):
+    """
+    Transcreve os arquivos em paralelo, entregando cada transcrição assim que fica pronta
+    """
+    digests = digests or {}
+    audio_urls = audio_urls or {}
+    max_workers = max(1, min(TRANSCRIPTION_WORKERS, len(audio_files)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(transcribe_with_cache, transcription_service, path, digests.get(path),
+                                   audio_urls.get(path))
+                   for path in audio_files]
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                yield result
+
+# Página inicial estática: codificada e com ETag calculado uma única vez
+INDEX_HTML = """
     <!DOCTYPE html>
     <html lang="pt-BR">
     <head>
@@ -300,6 +591,29 @@ def index():
                 progressBar.style.width = percent + '%';
             }
             
+            // Consulta o andamento do processamento até o relatório ficar pronto
+            async function waitForReport(reportId) {
+                while (true) {
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                    
+                    const response = await fetch(`/status/${reportId}`);
+                    if (!response.ok) {
+                        throw new Error(`Erro HTTP: ${response.status}`);
+                    }
+                    
+                    const job = await response.json();
+                    if (job.state === 'concluido') {
+                        return job;
+                    }
+                    if (job.state === 'erro') {
+                        throw new Error(job.error || 'Erro desconhecido');
+                    }
+                    
+                    updateProgress(job.pct);
+                    showStatus(`${job.stage}...`, 'info');
+                }
+            }
+            
             async function processFiles() {
                 if (selectedFiles.length === 0) {
                     showStatus('Selecione pelo menos um arquivo de áudio', 'error');
@@ -319,15 +633,16 @@ def index():
                 updateProgress(0);
                 
                 try {
+                    // As chaves vão antes dos áudios: assim o servidor já pode repassar
+                    // cada arquivo ao AssemblyAI enquanto ele é enviado
                     const formData = new FormData();
+                    formData.append('assemblyai_key', assemblyaiKey);
+                    formData.append('openai_key', openaiKey);
                     
                     selectedFiles.forEach((file, index) => {
                         formData.append('audio_files', file);
                     });
                     
-                    formData.append('assemblyai_key', assemblyaiKey);
-                    formData.append('openai_key', openaiKey);
-                    
                     const response = await fetch('/process', {
                         method: 'POST',
                         body: formData
@@ -339,19 +654,20 @@ def index():
                     
                     const result = await response.json();
                     
-                    if (result.success) {
-                        updateProgress(100);
-                        showStatus('Processamento concluído com sucesso!', 'success');
-                        
-                        // Mostra link de download
-                        const downloadSection = document.getElementById('download-section');
-                        const downloadLink = document.getElementById('download-link');
-                        downloadLink.href = `/download/${result.report_id}`;
-                        downloadSection.style.display = 'block';
-                    } else {
+                    if (!result.success) {
                         throw new Error(result.error || 'Erro desconhecido');
                     }
                     
+                    await waitForReport(result.report_id);
+                    updateProgress(100);
+                    showStatus('Processamento concluído com sucesso!', 'success');
+                    
+                    // Mostra link de download
+                    const downloadSection = document.getElementById('download-section');
+                    const downloadLink = document.getElementById('download-link');
+                    downloadLink.href = `/download/${result.report_id}`;
+                    downloadSection.style.display = 'block';
+                    
                 } catch (error) {
                     showStatus(`Erro: ${error.message}`, 'error');
                     updateProgress(0);
@@ -363,94 +679,224 @@ def index():
     </body>
     </html>
     """
+INDEX_BYTES = INDEX_HTML.encode('utf-8')
+INDEX_ETAG = hashlib.sha256(INDEX_BYTES).hexdigest()[:32]
 
-@app.route('/process', methods=['POST'])
-def process_audio_files():
+@app.route('/')
+def index():
     """
-    Processa arquivos de áudio enviados
+    Página inicial
     """
+    response = Response(INDEX_BYTES, mimetype='text/html')
+    response.set_etag(INDEX_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+def status_path(report_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"status_vvn_{report_id}.json")
+
+def write_status(report_id, **status):
+    """
+    Grava o andamento do processamento em disco, visível para todos os workers
+    """
+    # Grava ao lado e renomeia: quem consulta /status nunca lê um JSON pela metade
+    path = status_path(report_id)
+    partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(partial_path, path)
+
+def run_pipeline(report_id, uploads, assemblyai_key, openai_key):
+    """
+    Executa transcrição, análise, classificação, agrupamento e relatório em segundo plano,
+    registrando o andamento de cada etapa
+    """
+    temp_files = uploads.paths
     try:
-        # Verifica se há arquivos
-        if 'audio_files' not in request.files:
-            return jsonify({'success': False, 'error': 'Nenhum arquivo enviado'})
+        # Serviços que dependem das chaves das APIs
+        transcription_service = get_transcription_service(assemblyai_key)
+        analysis_service = get_analysis_service(openai_key)
         
-        files = request.files.getlist('audio_files')
-        if not files or all(file.filename == '' for file in files):
-            return jsonify({'success': False, 'error': 'Nenhum arquivo selecionado'})
+        # 1 e 2. Transcrição e análise em pipeline: cada conversa começa a ser
+        # analisada assim que sua transcrição termina, sem esperar as demais
+        logger.info("🎤 [%s] Iniciando transcrição e análise de %d arquivo(s)...", report_id, len(temp_files))
+        write_status(report_id, state='processando', stage='Transcrevendo e analisando ligações', pct=5)
+        transcriptions = []
         
-        # Verifica chaves das APIs
-        assemblyai_key = request.form.get('assemblyai_key')
-        openai_key = request.form.get('openai_key')
-        
-        if not assemblyai_key or not openai_key:
-            return jsonify({'success': False, 'error': 'Chaves das APIs são obrigatórias'})
-        
-        # Salva arquivos temporariamente
-        temp_files = []
-        for file in files:
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}_{filename}")
-                file.save(temp_path)
-                temp_files.append(temp_path)
-        
-        if not temp_files:
-            return jsonify({'success': False, 'error': 'Nenhum arquivo válido encontrado'})
-        
-        # Inicializa serviços
-        transcription_service = AssemblyAITranscriptionService(assemblyai_key)
-        analysis_service = VendorAnalysisService(openai_key)
-        grouping_service = VendorGroupingService()
-        classification_service = CallClassificationService()
-        report_generator = WordReportGenerator()
+        def collect_transcriptions():
+            for transcription in iter_transcriptions(transcription_service, temp_files, uploads.digests,
+                                                     uploads.audio_urls):
+                transcriptions.append(transcription)
+                yield transcription
         
-        # 1. Transcrição
-        print("🎤 Iniciando transcrição...")
-        transcriptions = transcription_service.transcribe_multiple_files(temp_files)
+        analyzed_conversations = []
+        for analyzed in analysis_service.iter_analyze_multiple_conversations(collect_transcriptions()):
+            analyzed_conversations.append(analyzed)
+            write_status(report_id, state='processando', stage='Transcrevendo e analisando ligações',
+                         pct=5 + int(65 * len(analyzed_conversations) / len(temp_files)))
         
         if not transcriptions:
-            return jsonify({'success': False, 'error': 'Falha na transcrição dos arquivos'})
-        
-        # 2. Análise
-        print("🧠 Iniciando análise...")
-        analyzed_conversations = analysis_service.analyze_multiple_conversations(transcriptions)
+            write_status(report_id, state='erro', error='Falha na transcrição dos arquivos')
+            return
         
         # 3. Classificação
-        print("🏷️ Classificando ligações...")
-        classified_conversations = classification_service.classify_multiple_calls(analyzed_conversations)
+        logger.info("🏷️ [%s] Classificando ligações...", report_id)
+        write_status(report_id, state='processando', stage='Classificando ligações', pct=75)
+        # As conversas analisadas não são usadas depois daqui: classifica sem copiá-las
+        classified_conversations = CLASSIFICATION_SERVICE.classify_multiple_calls(analyzed_conversations, in_place=True)
         
         # 4. Agrupamento por vendedor
-        print("👥 Agrupando por vendedor...")
-        vendor_data = grouping_service.process_all_vendors(classified_conversations)
+        logger.info("👥 [%s] Agrupando por vendedor...", report_id)
+        write_status(report_id, state='processando', stage='Agrupando por vendedor', pct=85)
+        vendor_data = GROUPING_SERVICE.process_all_vendors(classified_conversations)
         
         # 5. Geração do relatório
-        print("📄 Gerando relatório...")
-        report_id = str(uuid.uuid4())
+        logger.info("📄 [%s] Gerando relatório...", report_id)
+        write_status(report_id, state='processando', stage='Gerando relatório', pct=92)
         report_path = os.path.join(app.config['UPLOAD_FOLDER'], f"relatorio_vvn_{report_id}.docx")
         
-        report_generator.generate_comprehensive_report(vendor_data, report_path)
+        # Gera em um arquivo temporário e renomeia ao final: /download nunca
+        # encontra um relatório incompleto, mesmo se a geração falhar no meio
+        partial_path = f"{report_path}.{os.getpid()}.tmp"
+        try:
+            get_report_pool().submit(render_report, vendor_data, partial_path).result()
+            with open(partial_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(partial_path, report_path)
+        finally:
+            remove_files([partial_path])
         
-        # Limpa arquivos temporários
-        for temp_file in temp_files:
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+        write_status(report_id, state='concluido', stage='Processamento concluído', pct=100, summary={
+            'total_files': len(temp_files),
+            'total_transcriptions': len(transcriptions),
+            'total_vendors': vendor_data.get('total_vendedores', 0),
+            'total_conversations': vendor_data.get('total_conversas', 0)
+        })
+        
+    except Exception as e:
+        logger.exception("❌ [%s] Erro no processamento: %s", report_id, e)
+        write_status(report_id, state='erro', error=str(e))
+    finally:
+        # Os áudios não são mais necessários, mesmo quando o processamento falha
+        uploads.discard()
+
+def clean_old_reports():
+    """
+    Remove relatórios e arquivos de status expirados e, se o espaço ocupado pelos
+    relatórios passar do limite, os mais antigos primeiro
+    """
+    folder = app.config['UPLOAD_FOLDER']
+    now = time.time()
+    reports = []
+    for path in glob.glob(os.path.join(folder, 'relatorio_vvn_*.docx')) + \
+            glob.glob(os.path.join(folder, 'status_vvn_*.json')):
+        with contextlib.suppress(OSError):
+            stat = os.stat(path)
+            if now - stat.st_mtime > REPORT_TTL:
+                os.remove(path)
+            elif path.endswith('.docx'):
+                reports.append((stat.st_mtime, stat.st_size, path))
+    
+    total = sum(size for _, size, _ in reports)
+    for _, size, path in sorted(reports):
+        if total <= REPORTS_MAX_BYTES:
+            break
+        remove_files([path])
+        total -= size
+
+def janitor_loop():
+    while True:
+        try:
+            clean_old_reports()
+        except Exception as e:
+            logger.warning("⚠️ Falha ao limpar relatórios antigos: %s", e)
+        time.sleep(JANITOR_INTERVAL)
+
+@lru_cache(maxsize=None)
+def start_janitor():
+    # Iniciado sob demanda em cada processo: threads não sobrevivem ao fork dos workers
+    threading.Thread(target=janitor_loop, name='vvn-janitor', daemon=True).start()
+
+@app.route('/process', methods=['POST'])
+def process_audio_files():
+    """
+    Recebe os arquivos de áudio e agenda o processamento em segundo plano
+    """
+    start_janitor()
+    audio_target = None
+    handed_off = False
+    try:
+        if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'success': False, 'error': 'Arquivos excedem o tamanho máximo permitido'}), 413
+        
+        # Lê o corpo em blocos e repassa os áudios ao AssemblyAI (ou ao disco)
+        # conforme chegam, sem passar pelo parser multipart do werkzeug
+        parser = StreamingFormDataParser(headers=request.headers)
+        assemblyai_target = ValueTarget()
+        openai_target = ValueTarget()
+        audio_target = AudioUploadTarget(app.config['UPLOAD_FOLDER'], assemblyai_target)
+        parser.register('audio_files', audio_target)
+        parser.register('assemblyai_key', assemblyai_target)
+        parser.register('openai_key', openai_target)
+        
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+        
+        # Corpo terminado no meio de um arquivo (sem o boundary final)
+        if audio_target.in_progress:
+            return jsonify({'success': False, 'error': 'Upload incompleto'}), 400
+        
+        # Verifica se há arquivos
+        if audio_target.received_files == 0:
+            return jsonify({'success': False, 'error': 'Nenhum arquivo enviado'})
+        
+        # Verifica chaves das APIs
+        assemblyai_key = assemblyai_target.value.decode('utf-8').strip()
+        openai_key = openai_target.value.decode('utf-8').strip()
+        
+        if not assemblyai_key or not openai_key:
+            return jsonify({'success': False, 'error': 'Chaves das APIs são obrigatórias'})
+        
+        if not audio_target.paths:
+            return jsonify({'success': False, 'error': 'Nenhum arquivo válido encontrado'})
+        
+        # O processamento leva minutos: a requisição retorna logo e o
+        # navegador acompanha o andamento por /status/<report_id>
+        report_id = str(uuid.uuid4())
+        write_status(report_id, state='na_fila', stage='Aguardando processamento', pct=0)
+        pipeline_executor.submit(run_pipeline, report_id, audio_target, assemblyai_key, openai_key)
+        handed_off = True
         
         return jsonify({
             'success': True,
             'report_id': report_id,
-            'summary': {
-                'total_files': len(temp_files),
-                'total_transcriptions': len(transcriptions),
-                'total_vendors': vendor_data.get('total_vendedores', 0),
-                'total_conversations': vendor_data.get('total_conversas', 0)
-            }
-        })
+            'status_url': f"/status/{report_id}"
+        }), 202
         
     except Exception as e:
-        print(f"❌ Erro no processamento: {str(e)}")
+        logger.exception("❌ Erro ao receber os arquivos: %s", e)
         return jsonify({'success': False, 'error': str(e)})
+        
+    finally:
+        # Fora do pipeline, os arquivos e uploads da requisição são descartados aqui,
+        # inclusive o upload de um arquivo que não terminou de chegar
+        if audio_target is not None and not handed_off:
+            audio_target.discard()
+
+@app.route('/status/<report_id>')
+def processing_status(report_id):
+    """
+    Andamento do processamento de um relatório
+    """
+    try:
+        with open(status_path(secure_filename(report_id)), encoding='utf-8') as f:
+            return jsonify(json.load(f))
+    except FileNotFoundError:
+        return jsonify({'error': 'Processamento não encontrado'}), 404
 
 @app.route('/download/<report_id>')
 def download_report(report_id):
@@ -463,31 +909,35 @@ def download_report(report_id):
         if not os.path.exists(report_path):
             return jsonify({'error': 'Relatório não encontrado'}), 404
         
+        # Respostas condicionais permitem 304 e downloads retomados (Range); o
+        # corpo é entregue pelo wsgi.file_wrapper do servidor (sendfile)
         return send_file(
             report_path,
             as_attachment=True,
             download_name=f"relatorio_vvn_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx",
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            conditional=True,
+            etag=True,
+            last_modified=os.path.getmtime(report_path)
         )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Corpo fixo: a verificação é consultada com frequência pelo balanceador de carga
+HEALTH_BYTES = json.dumps({'status': 'healthy', 'version': '1.0.0'}).encode('utf-8')
+
 @app.route('/health')
 def health_check():
     """
     Verificação de saúde da aplicação
     """
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
-    })
+    return Response(HEALTH_BYTES, mimetype='application/json')
 
 if __name__ == '__main__':
     # Cria diretório de upload se não existir
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
-    # Executa aplicação
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py app:app
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=os.environ.get('FLASK_DEBUG') == '1')
 
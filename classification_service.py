@@ -1,96 +1,207 @@
 """
 Serviço de Classificação e Pontuação de Ligações
 """
-from typing import Dict, List
+import heapq
+import multiprocessing
+from bisect import bisect_right
+from collections import defaultdict
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache, partial
+from types import MappingProxyType
+
+# Faixas de classificação: limites percentuais crescentes e a (classificação, descrição)
+# de cada intervalo; _BANDS[i] vale para _BAND_THRESHOLDS[i - 1] <= pontuação < _BAND_THRESHOLDS[i]
+_BAND_THRESHOLDS = (50, 65, 80)
+_BANDS = (
+    ('D', 'Precisa Melhorar'),
+    ('C', 'Regular'),
+    ('B', 'Boa'),
+    ('A', 'Excelente')
+)
+
+# Abaixo deste número de ligações o custo de iniciar processos supera o ganho
+PARALLEL_MIN_CALLS = 500
 
 
 class CallClassificationService:
+    # Critérios de pontuação (somente leitura, compartilhados por todas as instâncias)
+    _SCORING_CRITERIA = MappingProxyType({
+        'sentimento_geral': MappingProxyType({
+            'positivo': 3,
+            'neutro': 2,
+            'negativo': 1
+        }),
+        'resultado_conversa': MappingProxyType({
+            'venda_fechada': 4,
+            'follow_up_agendado': 3,
+            'indefinido': 2,
+            'cliente_perdido': 1
+        }),
+        'nivel_interesse_cliente': MappingProxyType({
+            'alto': 3,
+            'medio': 2,
+            'baixo': 1
+        }),
+        'satisfacao_cliente': MappingProxyType({
+            'alta': 3,
+            'media': 2,
+            'baixa': 1
+        }),
+        'performance_vendedor': MappingProxyType({
+            'excelente': 4,
+            'boa': 3,
+            'regular': 2,
+            'ruim': 1
+        })
+    })
+    # Nome público mantido para quem já lia os critérios da instância
+    scoring_criteria = _SCORING_CRITERIA
+    
+    # Fatores que influenciam a nota do vendedor
+    _VENDOR_FACTORS = MappingProxyType({
+        'performance_vendedor': MappingProxyType({
+            'excelente': 10,
+            'boa': 7.5,
+            'regular': 5,
+            'ruim': 2.5
+        }),
+        'resultado_conversa': MappingProxyType({
+            'venda_fechada': 3,
+            'follow_up_agendado': 2,
+            'indefinido': 1,
+            'cliente_perdido': 0
+        }),
+        'sentimento_geral': MappingProxyType({
+            'positivo': 2,
+            'neutro': 1,
+            'negativo': 0
+        })
+    })
+    
+    # Recomendação para cada critério com pontuação baixa
+    _LOW_SCORE_RECS = MappingProxyType({
+        'sentimento_geral': "Melhorar abordagem e empatia com o cliente",
+        'resultado_conversa': "Trabalhar técnicas de fechamento e follow-up",
+        'nivel_interesse_cliente': "Desenvolver melhor descoberta de necessidades",
+        'satisfacao_cliente': "Focar em atendimento e resolução de problemas",
+        'performance_vendedor': "Treinamento geral em técnicas de vendas"
+    })
+    
+    # Problemas específicos: (campo, valor, ponto crítico)
+    _CRITICAL_TRIGGERS = (
+        ('resultado_conversa', 'cliente_perdido', "Cliente perdido - analisar causas"),
+        ('sentimento_geral', 'negativo', "Sentimento negativo do cliente"),
+        ('nivel_interesse_cliente', 'baixo', "Baixo interesse do cliente")
+    )
+    
     def __init__(self):
-        # Critérios de pontuação
-        self.scoring_criteria = {
-            'sentimento_geral': {
-                'positivo': 3,
-                'neutro': 2,
-                'negativo': 1
-            },
-            'resultado_conversa': {
-                'venda_fechada': 4,
-                'follow_up_agendado': 3,
-                'indefinido': 2,
-                'cliente_perdido': 1
-            },
-            'nivel_interesse_cliente': {
-                'alto': 3,
-                'medio': 2,
-                'baixo': 1
-            },
-            'satisfacao_cliente': {
-                'alta': 3,
-                'media': 2,
-                'baixa': 1
-            },
-            'performance_vendedor': {
-                'excelente': 4,
-                'boa': 3,
-                'regular': 2,
-                'ruim': 1
-            }
-        }
+        # Pontuação máxima de cada critério e do total, fixas após a inicialização
+        self._criteria_max = {criterion: max(values.values()) for criterion, values in self._SCORING_CRITERIA.items()}
+        self._total_max = sum(self._criteria_max.values())
+        
+        # Campos categóricos comparados em minúsculas durante a classificação
+        self._categorical_fields = tuple(self._SCORING_CRITERIA) + ('qualidade_ligacao',)
+        # Atributos da ligação dos quais a classificação depende (ver _call_features)
+        self._feature_fields = self._categorical_fields + (
+            'qtd_oportunidades_perdidas', 'qtd_objecoes_cliente', 'momento_critico'
+        )
+        
+        # Combinações de atributos se repetem muito entre ligações: cada uma é calculada uma vez
+        self._classify_core = lru_cache(maxsize=4096)(self._compute_classification)
+    
+    def __getstate__(self):
+        # O cache não é serializável: cada processo que recebe o serviço cria o seu
+        state = self.__dict__.copy()
+        del state['_classify_core']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._classify_core = lru_cache(maxsize=4096)(self._compute_classification)
     
-    def classify_call(self, analysis: Dict) -> Dict:
+    def classify_call(self, analysis: Dict, timestamp: Optional[str] = None) -> Dict:
         """
         Classifica uma ligação baseada na análise
         
         Args:
             analysis: Dicionário com análise da conversa
-            
+            timestamp: Horário da classificação (opcional; padrão: agora)
+        
         Returns:
             Dicionário com classificação e pontuação detalhada
         """
+        result = dict(self._classify_core(self._call_features(analysis)))
+        
+        # O resultado em cache é compartilhado entre ligações com os mesmos atributos:
+        # cada chamada recebe cópias próprias das estruturas aninhadas
+        result['pontuacao_detalhada'] = {
+            criterion: dict(score) for criterion, score in result['pontuacao_detalhada'].items()
+        }
+        result['pontos_criticos'] = list(result['pontos_criticos'])
+        result['recomendacoes_classificacao'] = list(result['recomendacoes_classificacao'])
+        
+        # A recomendação que cita os pontos fortes depende de texto livre e fica fora do cache
+        pontos_fortes = analysis.get('pontos_fortes', [])
+        if pontos_fortes and len(result['recomendacoes_classificacao']) < 4:
+            result['recomendacoes_classificacao'].append(f"Manter pontos fortes: {', '.join(pontos_fortes[:2])}")
+        
+        result['timestamp_classificacao'] = timestamp or datetime.now().isoformat()
+        return result
+    
+    def _call_features(self, analysis: Dict) -> tuple:
+        """
+        Reduz a análise aos atributos usados na classificação: campos categóricos em
+        minúsculas ('' se ausentes), quantidades de oportunidades perdidas e de objeções
+        e se há momento crítico, na ordem de self._feature_fields
+        """
+        features = []
+        for field in self._categorical_fields:
+            value = analysis.get(field)
+            features.append(value.lower() if isinstance(value, str) else '')
+        
+        oportunidades = analysis.get('oportunidades_perdidas')
+        objecoes = analysis.get('objecoes_cliente')
+        features.append(len(oportunidades) if oportunidades else 0)
+        features.append(len(objecoes) if objecoes else 0)
+        features.append(bool(analysis.get('momento_critico')))
+        return tuple(features)
+    
+    def _compute_classification(self, key: tuple) -> Dict:
+        """
+        Calcula a classificação de uma combinação de atributos (ver _call_features)
+        """
+        features = dict(zip(self._feature_fields, key))
+        
         # Calcula pontuação por critério
         scores = {}
         total_score = 0
-        max_possible_score = 0
+        max_possible_score = self._total_max
         
-        for criterion, values in self.scoring_criteria.items():
-            analysis_value = analysis.get(criterion, '').lower()
+        for criterion, values in self._SCORING_CRITERIA.items():
+            analysis_value = features[criterion]
             score = values.get(analysis_value, 0)
             scores[criterion] = {
                 'valor': analysis_value,
                 'pontos': score,
-                'maximo': max(values.values())
+                'maximo': self._criteria_max[criterion]
             }
             total_score += score
-            max_possible_score += max(values.values())
         
         # Calcula pontuação percentual
         percentage_score = (total_score / max_possible_score) * 100 if max_possible_score > 0 else 0
         
         # Determina classificação (A, B, C, D)
-        if percentage_score >= 80:
-            classification = 'A'
-            classification_desc = 'Excelente'
-        elif percentage_score >= 65:
-            classification = 'B'
-            classification_desc = 'Boa'
-        elif percentage_score >= 50:
-            classification = 'C'
-            classification_desc = 'Regular'
-        else:
-            classification = 'D'
-            classification_desc = 'Precisa Melhorar'
+        classification, classification_desc = _BANDS[bisect_right(_BAND_THRESHOLDS, percentage_score)]
         
         # Determina nota do vendedor baseada em múltiplos fatores
-        vendor_score = self._calculate_vendor_score(analysis)
-        
-        # Identifica pontos críticos
-        critical_points = self._identify_critical_points(analysis, scores)
+        vendor_score = self._calculate_vendor_score(features)
         
-        # Gera recomendações específicas
-        recommendations = self._generate_call_recommendations(analysis, scores)
+        # Identifica pontos críticos e gera recomendações específicas
+        critical_points, recommendations = self._derive_feedback(features, scores)
         
-        result = {
+        return {
             'classificacao': classification,
             'classificacao_descricao': classification_desc,
             'pontuacao_total': total_score,
@@ -99,63 +210,52 @@ class CallClassificationService:
             'nota_vendedor': vendor_score,
             'pontuacao_detalhada': scores,
             'pontos_criticos': critical_points,
-            'recomendacoes_classificacao': recommendations,
-            'timestamp_classificacao': datetime.now().isoformat()
+            'recomendacoes_classificacao': recommendations
         }
-        
-        return result
+
+    def _calculate_vendor_score(self, features: Dict) -> float:
+        """
+        Calcula nota específica do vendedor (1-10) a partir dos atributos da ligação
+        """
+        return self._vendor_core(
+            features['performance_vendedor'],
+            features['resultado_conversa'],
+            features['sentimento_geral'],
+            features['qtd_oportunidades_perdidas'] > 2,
+            features['qtd_objecoes_cliente'] > 3,
+            features['qualidade_ligacao'] == 'ruim'
+        )
     
-    def _calculate_vendor_score(self, analysis: Dict) -> float:
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _vendor_core(performance: str, result: str, sentiment: str, many_missed: bool,
+                     many_objections: bool, poor_quality: bool) -> float:
         """
-        Calcula nota específica do vendedor (1-10)
+        Nota do vendedor para uma combinação de atributos; as combinações possíveis são
+        poucas e se repetem entre ligações, então cada uma é calculada uma única vez
         """
-        # Fatores que influenciam a nota do vendedor
-        factors = {
-            'performance_vendedor': {
-                'excelente': 10,
-                'boa': 7.5,
-                'regular': 5,
-                'ruim': 2.5
-            },
-            'resultado_conversa': {
-                'venda_fechada': 3,
-                'follow_up_agendado': 2,
-                'indefinido': 1,
-                'cliente_perdido': 0
-            },
-            'sentimento_geral': {
-                'positivo': 2,
-                'neutro': 1,
-                'negativo': 0
-            }
-        }
+        factors = CallClassificationService._VENDOR_FACTORS
         
-        base_score = factors['performance_vendedor'].get(
-            analysis.get('performance_vendedor', '').lower(), 5
-        )
+        base_score = factors['performance_vendedor'].get(performance, 5)
         
         # Ajustes baseados em resultado e sentimento
-        result_bonus = factors['resultado_conversa'].get(
-            analysis.get('resultado_conversa', '').lower(), 0
-        )
+        result_bonus = factors['resultado_conversa'].get(result, 0)
         
-        sentiment_bonus = factors['sentimento_geral'].get(
-            analysis.get('sentimento_geral', '').lower(), 0
-        )
+        sentiment_bonus = factors['sentimento_geral'].get(sentiment, 0)
         
         # Penalidades por problemas específicos
         penalties = 0
         
         # Penalidade por oportunidades perdidas
-        if analysis.get('oportunidades_perdidas') and len(analysis['oportunidades_perdidas']) > 2:
+        if many_missed:
             penalties += 0.5
         
         # Penalidade por muitas objeções não tratadas
-        if analysis.get('objecoes_cliente') and len(analysis['objecoes_cliente']) > 3:
+        if many_objections:
             penalties += 0.5
         
         # Penalidade por qualidade ruim da ligação
-        if analysis.get('qualidade_ligacao', '').lower() == 'ruim':
+        if poor_quality:
             penalties += 1
         
         final_score = base_score + result_bonus + sentiment_bonus - penalties
@@ -163,100 +263,93 @@ class CallClassificationService:
         # Garante que a nota está entre 1 e 10
         return max(1, min(10, round(final_score, 1)))
     
-    def _identify_critical_points(self, analysis: Dict, scores: Dict) -> List[str]:
+    def _derive_feedback(self, features: Dict, scores: Dict) -> Tuple[List[str], List[str]]:
         """
-        Identifica pontos críticos da ligação
+        Identifica os pontos críticos e gera as recomendações da ligação a partir dos
+        seus atributos, percorrendo as pontuações uma única vez
+        (a recomendação sobre pontos fortes é acrescentada em classify_call)
+        
+        Returns:
+            Tupla (pontos críticos, recomendações)
         """
         critical_points = []
+        recommendations = []
         
-        # Verifica pontuações baixas
+        # Pontuações baixas geram ponto crítico e recomendação
         for criterion, score_data in scores.items():
             if score_data['pontos'] <= 1:
                 critical_points.append(f"Baixa pontuação em {criterion}: {score_data['valor']}")
+                recommendation = self._LOW_SCORE_RECS.get(criterion)
+                if recommendation:
+                    recommendations.append(recommendation)
         
         # Verifica problemas específicos
-        if analysis.get('resultado_conversa', '').lower() == 'cliente_perdido':
-            critical_points.append("Cliente perdido - analisar causas")
-        
-        if analysis.get('sentimento_geral', '').lower() == 'negativo':
-            critical_points.append("Sentimento negativo do cliente")
-        
-        if analysis.get('nivel_interesse_cliente', '').lower() == 'baixo':
-            critical_points.append("Baixo interesse do cliente")
+        for field, value, message in self._CRITICAL_TRIGGERS:
+            if features[field] == value:
+                critical_points.append(message)
         
         # Verifica oportunidades perdidas
-        oportunidades = analysis.get('oportunidades_perdidas', [])
-        if oportunidades and len(oportunidades) > 2:
-            critical_points.append(f"Múltiplas oportunidades perdidas ({len(oportunidades)})")
+        oportunidades = features['qtd_oportunidades_perdidas']
+        if oportunidades > 2:
+            critical_points.append(f"Múltiplas oportunidades perdidas ({oportunidades})")
         
         # Verifica objeções não tratadas
-        objecoes = analysis.get('objecoes_cliente', [])
-        if objecoes and len(objecoes) > 2:
-            critical_points.append(f"Múltiplas objeções do cliente ({len(objecoes)})")
-        
-        return critical_points[:5]  # Máximo 5 pontos críticos
-    
-    def _generate_call_recommendations(self, analysis: Dict, scores: Dict) -> List[str]:
-        """
-        Gera recomendações específicas para a ligação
-        """
-        recommendations = []
-        
-        # Recomendações baseadas em pontuações baixas
-        for criterion, score_data in scores.items():
-            if score_data['pontos'] <= 1:
-                if criterion == 'sentimento_geral':
-                    recommendations.append("Melhorar abordagem e empatia com o cliente")
-                elif criterion == 'resultado_conversa':
-                    recommendations.append("Trabalhar técnicas de fechamento e follow-up")
-                elif criterion == 'nivel_interesse_cliente':
-                    recommendations.append("Desenvolver melhor descoberta de necessidades")
-                elif criterion == 'satisfacao_cliente':
-                    recommendations.append("Focar em atendimento e resolução de problemas")
-                elif criterion == 'performance_vendedor':
-                    recommendations.append("Treinamento geral em técnicas de vendas")
+        objecoes = features['qtd_objecoes_cliente']
+        if objecoes > 2:
+            critical_points.append(f"Múltiplas objeções do cliente ({objecoes})")
         
         # Recomendações específicas baseadas na análise
-        if analysis.get('momento_critico'):
+        if features['momento_critico']:
             recommendations.append("Analisar momento crítico identificado na conversa")
         
-        if analysis.get('oportunidades_perdidas'):
+        if oportunidades:
             recommendations.append("Revisar oportunidades perdidas para aprendizado")
         
-        # Recomendações baseadas em pontos fortes
-        pontos_fortes = analysis.get('pontos_fortes', [])
-        if pontos_fortes:
-            recommendations.append(f"Manter pontos fortes: {', '.join(pontos_fortes[:2])}")
-        
-        return recommendations[:4]  # Máximo 4 recomendações
-    
-    def classify_multiple_calls(self, analyzed_conversations: List[Dict]) -> List[Dict]:
+        # Máximo 5 pontos críticos e 4 recomendações
+        return critical_points[:5], recommendations[:4]
+
+    def classify_multiple_calls(self, analyzed_conversations: List[Dict], in_place: bool = False,
+                                progress_cb: Optional[Callable[[int, int], None]] = None,
+                                workers: Optional[int] = None) -> List[Dict]:
         """
         Classifica múltiplas ligações
         
         Args:
             analyzed_conversations: Lista de conversas analisadas
+            in_place: Acrescenta a classificação às próprias conversas, sem copiá-las
+            progress_cb: Recebe (classificadas, total) a cada 1% do lote (opcional)
+            workers: Processos usados em lotes com mais de PARALLEL_MIN_CALLS ligações (opcional)
             
         Returns:
             Lista de conversas com classificação adicionada
         """
         classified_calls = []
+        # Todas as ligações do lote compartilham o mesmo horário
+        timestamp = datetime.now().isoformat()
+        total = len(analyzed_conversations)
+        progress_step = max(1, total // 100)
+        
+        print(f"🏷️ Classificando {total} ligação(ões)...")
+        
+        classify = partial(self.classify_call, timestamp=timestamp)
+        analyses = [conversation.get('analise', {}) for conversation in analyzed_conversations]
+        if workers and workers > 1 and total > PARALLEL_MIN_CALLS:
+            # Lotes grandes são divididos entre processos (a classificação é CPU-bound).
+            # Só as análises são enviadas: as conversas, com as transcrições, ficam aqui
+            with multiprocessing.get_context('spawn').Pool(workers) as pool:
+                classifications = pool.map(classify, analyses, chunksize=max(1, total // (workers * 4)))
+        else:
+            classifications = map(classify, analyses)
         
-        print(f"🏷️ Classificando {len(analyzed_conversations)} ligação(ões)...")
-        
-        for i, conversation in enumerate(analyzed_conversations, 1):
-            analysis = conversation.get('analise', {})
-            
-            # Classifica a ligação
-            classification = self.classify_call(analysis)
-            
+        for i, (conversation, classification) in enumerate(zip(analyzed_conversations, classifications), 1):
             # Adiciona classificação à conversa
-            conversation_with_classification = conversation.copy()
+            conversation_with_classification = conversation if in_place else conversation.copy()
             conversation_with_classification['classificacao'] = classification
             
             classified_calls.append(conversation_with_classification)
             
-            print(f"✅ Ligação {i} classificada: {classification['classificacao']} (Nota: {classification['nota_vendedor']})")
+            if progress_cb and (i % progress_step == 0 or i == total):
+                progress_cb(i, total)
         
         print(f"🎉 Classificação concluída!")
         return classified_calls
@@ -267,30 +360,15 @@ class CallClassificationService:
         
         Args:
             classified_calls: Lista de ligações classificadas
-            
+        
         Returns:
             Dicionário com resumo das classificações
         """
         if not classified_calls:
             return {}
         
-        # Conta classificações
-        classifications = {'A': 0, 'B': 0, 'C': 0, 'D': 0}
-        total_score = 0
-        vendor_scores = []
-        
-        for call in classified_calls:
-            classification_data = call.get('classificacao', {})
-            
-            # Conta classificação
-            classification = classification_data.get('classificacao', 'D')
-            if classification in classifications:
-                classifications[classification] += 1
-            
-            # Soma pontuações
-            total_score += classification_data.get('pontuacao_percentual', 0)
-            vendor_scores.append(classification_data.get('nota_vendedor', 0))
-        
+        totals = self._aggregate_calls(classified_calls)
+        classifications = totals['classificacoes']
         total_calls = len(classified_calls)
         
         # Calcula estatísticas
@@ -300,13 +378,13 @@ class CallClassificationService:
             'percentual_a_b': round(((classifications['A'] + classifications['B']) / total_calls) * 100, 1),
             'percentual_c_d': round(((classifications['C'] + classifications['D']) / total_calls) * 100, 1),
             
-            'pontuacao_media': round(total_score / total_calls, 1) if total_calls > 0 else 0,
-            'nota_media_vendedores': round(sum(vendor_scores) / len(vendor_scores), 1) if vendor_scores else 0,
+            'pontuacao_media': round(totals['pontuacao_total'] / total_calls, 1) if total_calls > 0 else 0,
+            'nota_media_vendedores': round(totals['soma_notas'] / total_calls, 1) if total_calls > 0 else 0,
             
-            'melhor_ligacao': self._find_best_call(classified_calls),
-            'pior_ligacao': self._find_worst_call(classified_calls),
+            'melhor_ligacao': totals['melhor_ligacao'],
+            'pior_ligacao': totals['pior_ligacao'],
             
-            'pontos_criticos_comuns': self._find_common_critical_points(classified_calls),
+            'pontos_criticos_comuns': self._format_common_critical_points(totals['pontos_criticos']),
             'recomendacoes_gerais': self._generate_general_recommendations(classifications, total_calls),
             
             'timestamp_resumo': datetime.now().isoformat()
@@ -314,72 +392,98 @@ class CallClassificationService:
         
         return summary
     
-    def _find_best_call(self, classified_calls: List[Dict]) -> Dict:
+    def _aggregate_calls(self, classified_calls: List[Dict]) -> Dict:
         """
-        Encontra a melhor ligação
+        Percorre as ligações uma única vez acumulando tudo que o resumo utiliza:
+        distribuição das classificações, somas, melhor e pior ligação e pontos críticos
         """
-        best_call = None
-        best_score = 0
+        classifications = {'A': 0, 'B': 0, 'C': 0, 'D': 0}
+        total_score = 0
+        vendor_score_sum = 0
+        best_call, best_score = None, 0
+        worst_call, worst_score = None, 100
+        critical_points = defaultdict(int)
         
         for call in classified_calls:
-            classification = call.get('classificacao', {})
-            score = classification.get('pontuacao_percentual', 0)
+            classification_data = call.get('classificacao', {})
+            
+            # Conta classificação
+            classification = classification_data.get('classificacao', 'D')
+            if classification in classifications:
+                classifications[classification] += 1
             
+            # Soma pontuações
+            score = classification_data.get('pontuacao_percentual', 0)
+            total_score += score
+            vendor_score_sum += classification_data.get('nota_vendedor', 0)
+            
+            # Melhor e pior ligação (ligações sem pontuação não concorrem à pior)
             if score > best_score:
                 best_score = score
-                best_call = {
-                    'arquivo': call.get('analise', {}).get('arquivo_origem', 'N/A'),
-                    'vendedor': call.get('analise', {}).get('vendedor', 'N/A'),
-                    'pontuacao': score,
-                    'classificacao': classification.get('classificacao', 'N/A')
-                }
-        
-        return best_call or {}
+                best_call = self._call_reference(call, classification_data, score)
+            if 'pontuacao_percentual' in classification_data and score < worst_score:
+                worst_score = score
+                worst_call = self._call_reference(call, classification_data, score)
+            
+            for point in classification_data.get('pontos_criticos', ()):
+                critical_points[point] += 1
+        
+        return {
+            'classificacoes': classifications,
+            'pontuacao_total': total_score,
+            'soma_notas': vendor_score_sum,
+            'melhor_ligacao': best_call or {},
+            'pior_ligacao': worst_call or {},
+            'pontos_criticos': critical_points
+        }
+    
+    def _call_reference(self, call: Dict, classification: Dict, score: float) -> Dict:
+        """
+        Identificação resumida de uma ligação para o resumo
+        """
+        return {
+            'arquivo': call.get('analise', {}).get('arquivo_origem', 'N/A'),
+            'vendedor': call.get('analise', {}).get('vendedor', 'N/A'),
+            'pontuacao': score,
+            'classificacao': classification.get('classificacao', 'N/A')
+        }
+    
+    def _find_best_call(self, classified_calls: List[Dict]) -> Dict:
+        """
+        Encontra a melhor ligação
+        """
+        return self._aggregate_calls(classified_calls)['melhor_ligacao']
     
     def _find_worst_call(self, classified_calls: List[Dict]) -> Dict:
         """
         Encontra a pior ligação
         """
-        worst_call = None
-        worst_score = 100
-        
-        for call in classified_calls:
-            classification = call.get('classificacao', {})
-            score = classification.get('pontuacao_percentual', 100)
-            
-            if score < worst_score:
-                worst_score = score
-                worst_call = {
-                    'arquivo': call.get('analise', {}).get('arquivo_origem', 'N/A'),
-                    'vendedor': call.get('analise', {}).get('vendedor', 'N/A'),
-                    'pontuacao': score,
-                    'classificacao': classification.get('classificacao', 'N/A')
-                }
-        
-        return worst_call or {}
+        return self._aggregate_calls(classified_calls)['pior_ligacao']
     
     def _find_common_critical_points(self, classified_calls: List[Dict]) -> List[str]:
         """
         Encontra pontos críticos mais comuns
         """
-        all_critical_points = []
-        
+        # Contagem incremental: memória proporcional aos pontos distintos, não ao total.
+        # Com listas curtas por ligação, o incremento direto é mais rápido que Counter.update
+        point_counts = defaultdict(int)
         for call in classified_calls:
-            classification = call.get('classificacao', {})
-            critical_points = classification.get('pontos_criticos', [])
-            all_critical_points.extend(critical_points)
-        
-        # Conta frequência
-        from collections import Counter
-        point_counts = Counter(all_critical_points)
+            for point in call.get('classificacao', {}).get('pontos_criticos', ()):
+                point_counts[point] += 1
         
-        # Retorna os 5 mais comuns
+        return self._format_common_critical_points(point_counts)
+    
+    def _format_common_critical_points(self, point_counts: Dict[str, int]) -> List[str]:
+        """
+        Formata os 5 pontos críticos mais comuns com sua frequência
+        """
+        # Seleção por heap em vez de ordenar todos os pontos (empates na ordem de aparição)
         common_points = []
-        for point, count in point_counts.most_common(5):
+        for point, count in heapq.nlargest(5, point_counts.items(), key=itemgetter(1)):
             common_points.append(f"{point} ({count} ocorrências)")
         
         return common_points
-    
+
     def _generate_general_recommendations(self, classifications: Dict, total_calls: int) -> List[str]:
         """
         Gera recomendações gerais baseadas na distribuição de classificações
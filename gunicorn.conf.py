@@ -0,0 +1,23 @@
+"""
+Configuração do gunicorn para produção - VVN AI Analyzer
+
+Uso: gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Processos importam a aplicação uma única vez no processo pai e compartilham
+# as páginas de memória por copy-on-write após o fork
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Threads por processo: uploads longos não bloqueiam as consultas de /status
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Uploads de até 500MB podem levar minutos
+timeout = 600
+graceful_timeout = 60
+keepalive = 5
@@ -1,17 +1,139 @@
 """
 Gerador de Relatórios em Word
 """
+import heapq
+import io
 import os
+from bisect import bisect_right
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, List
 from datetime import datetime
+from xml.sax.saxutils import escape
 from docx import Document
-from docx.shared import Inches, Pt
+from docx.shared import Emu, Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
 from docx.oxml.shared import OxmlElement, qn
 
 
+@lru_cache(maxsize=1)
+def _template_bytes() -> bytes:
+    """
+    Documento em branco com as margens do relatório, serializado uma vez por processo:
+    os relatórios seguintes partem destes bytes em vez de recarregar o modelo padrão
+    do python-docx e reconfigurar as seções
+    """
+    doc = Document()
+    
+    # Configura margens
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+    
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _run_xml(text: str, bold: bool = False) -> str:
+    """
+    XML de um trecho de texto (w:r), opcionalmente em negrito; quebras de linha
+    viram w:br, como no setter de texto do python-docx
+    """
+    run_props = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    content = '<w:br/>'.join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in text.split('\n'))
+    return f'<w:r>{run_props}{content}</w:r>'
+
+
+def _paragraph_xml(runs: str, style: str = '') -> str:
+    """
+    XML de um parágrafo com os trechos já montados, opcionalmente com um estilo (id do estilo)
+    """
+    paragraph_props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    return f'<w:p>{paragraph_props}{runs}</w:p>'
+
+
+def _cell_xml(text: str, width: int, bold: bool) -> str:
+    """
+    XML de uma célula de tabela com um único parágrafo
+    """
+    return f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr><w:p>{_run_xml(text, bold)}</w:p></w:tc>'
+
+
+def _bullet_list_xml(items: List[str], style: str = 'ListBullet') -> str:
+    """
+    XML de uma lista de marcadores: um parágrafo no estilo indicado (id do estilo) por item
+    """
+    return ''.join(_paragraph_xml(_run_xml(f"• {item}"), style) for item in items)
+
+
+def _table_xml(rows: List[List[str]], width: int, bold_first_col: bool = False,
+               bold_first_row: bool = False) -> str:
+    """
+    Monta de uma só vez o XML de uma tabela no estilo 'Table Grid', equivalente ao
+    de doc.add_table, sem passar pelo setter de texto de cada célula
+    
+    Args:
+        rows: Textos das células, linha a linha
+        width: Largura disponível para a tabela (EMU), dividida igualmente entre as colunas
+        bold_first_col: Destaca a primeira coluna em negrito
+        bold_first_row: Destaca a primeira linha (cabeçalho) em negrito
+    
+    Returns:
+        XML do elemento w:tbl
+    """
+    cols = len(rows[0])
+    col_width = Emu(width / cols).twips
+    grid = f'<w:gridCol w:w="{col_width}"/>' * cols
+    body = ''.join(
+        '<w:tr>' + ''.join(
+            _cell_xml(text, col_width, (bold_first_row and i == 0) or (bold_first_col and j == 0))
+            for j, text in enumerate(row)
+        ) + '</w:tr>'
+        for i, row in enumerate(rows)
+    )
+    return (
+        f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" '
+        f'w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>{grid}</w:tblGrid>{body}</w:tbl>'
+    )
+
+
 class WordReportGenerator:
+    # Vendedores exibidos no ranking da equipe; os demais são apenas contados
+    RANKING_TOP_K = 50
+    
+    # Recomendação para a equipe por faixa de nota média: _TEAM_RECOMMENDATIONS[i] vale
+    # para _TEAM_GRADE_THRESHOLDS[i - 1] <= nota < _TEAM_GRADE_THRESHOLDS[i]
+    _TEAM_GRADE_THRESHOLDS = (6, 7)
+    _TEAM_RECOMMENDATIONS = (
+        "🚨 URGENTE: A nota média da equipe está abaixo de 6. Recomenda-se treinamento intensivo em técnicas básicas de vendas.",
+        "⚠️ A equipe tem potencial de melhoria. Foco em treinamentos específicos por vendedor.",
+        "✅ A equipe está performando bem. Manter padrão atual e focar em casos específicos."
+    )
+    
+    # Recomendação por nível de performance do vendedor (demais níveis: a de 'Excelente')
+    _VENDOR_RECOMMENDATIONS = {
+        'Precisa Melhorar': "Prioridade alta para treinamento. ",
+        'Regular': "Acompanhamento próximo e treinamento específico. ",
+        'Bom': "Manter performance e trabalhar pontos específicos. ",
+        'Excelente': "Excelente performance, pode ser mentor para outros. "
+    }
+    
+    # Próximos passos para gestão, iguais em todos os relatórios
+    _MANAGEMENT_NEXT_STEPS = (
+        "Implementar plano de treinamento baseado nas prioridades identificadas",
+        "Agendar reuniões individuais com vendedores que precisam de atenção",
+        "Criar programa de mentoria com os melhores vendedores",
+        "Monitorar progresso mensalmente com nova análise de ligações",
+        "Desenvolver scripts para objeções mais comuns identificadas"
+    )
+    
     def __init__(self):
         pass
     
@@ -29,26 +151,29 @@ class WordReportGenerator:
         try:
             print("📄 Gerando relatório completo em Word...")
             
-            # Cria documento
-            doc = Document()
+            # Cria documento a partir do modelo já com as margens configuradas
+            doc = Document(io.BytesIO(_template_bytes()))
             
-            # Configura margens
-            sections = doc.sections
-            for section in sections:
-                section.top_margin = Inches(1)
-                section.bottom_margin = Inches(1)
-                section.left_margin = Inches(1)
-                section.right_margin = Inches(1)
+            # Data do relatório, a mesma na capa e no rodapé
+            generated_at = datetime.now().strftime('%d/%m/%Y %H:%M')
+            
+            # Partes dos dados usadas por várias seções, lidas uma única vez
+            team_stats = vendor_data.get('estatisticas_equipe', {})
+            vendors = vendor_data.get('vendedores', {})
             
             # Adiciona conteúdo
-            self._add_title_page(doc, vendor_data)
-            self._add_executive_summary(doc, vendor_data)
-            self._add_team_statistics(doc, vendor_data)
-            self._add_vendor_reports(doc, vendor_data)
-            self._add_recommendations(doc, vendor_data)
+            self._add_title_page(doc, vendor_data, generated_at)
+            self._add_executive_summary(doc, vendor_data, team_stats)
+            self._add_team_statistics(doc, vendors)
+            self._add_vendor_reports(doc, vendors)
+            self._add_recommendations(doc, team_stats, vendors, generated_at)
             
-            # Salva documento
-            doc.save(output_path)
+            # Salva documento: o zip é montado em memória (com as muitas escritas e
+            # seeks pequenos do zipfile) e vai para o disco em uma única escrita
+            buffer = io.BytesIO()
+            doc.save(buffer)
+            with open(output_path, 'wb') as f:
+                f.write(buffer.getbuffer())
             print(f"✅ Relatório salvo em: {output_path}")
             
             return output_path
@@ -57,7 +182,31 @@ class WordReportGenerator:
             print(f"❌ Erro ao gerar relatório: {str(e)}")
             raise
     
-    def _add_title_page(self, doc: Document, vendor_data: Dict):
+    def _add_table(self, doc: Document, rows: List[List[str]], bold_first_col: bool = False,
+                   bold_first_row: bool = False):
+        """
+        Acrescenta ao documento uma tabela já preenchida, inserida como um único elemento
+        """
+        section = doc.sections[-1]
+        width = section.page_width - section.left_margin - section.right_margin
+        doc.element.body._insert_tbl(parse_xml(_table_xml(rows, width, bold_first_col, bold_first_row)))
+    
+    def _add_paragraphs(self, doc: Document, paragraphs_xml: str):
+        """
+        Acrescenta ao documento parágrafos já montados em XML, lidos de uma vez por parse_xml
+        (o w:body serve apenas para agrupá-los)
+        """
+        body = doc.element.body
+        for paragraph in parse_xml(f'<w:body {nsdecls("w")}>{paragraphs_xml}</w:body>'):
+            body._insert_p(paragraph)
+    
+    def _add_bullet_list(self, doc: Document, items: List[str]):
+        """
+        Acrescenta ao documento uma lista de marcadores ('List Bullet') montada de uma vez
+        """
+        self._add_paragraphs(doc, _bullet_list_xml(items))
+    
+    def _add_title_page(self, doc: Document, vendor_data: Dict, generated_at: str):
         """
         Adiciona página de título
         """
@@ -75,26 +224,25 @@ class WordReportGenerator:
         info_para = doc.add_paragraph()
         info_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
         
-        run = info_para.add_run(f"Data do Relatório: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+        run = info_para.add_run(f"Data do Relatório: {generated_at}")
         run.bold = True
         
-        info_para.add_run(f"\\nTotal de Vendedores: {vendor_data.get('total_vendedores', 0)}")
-        info_para.add_run(f"\\nTotal de Ligações Analisadas: {vendor_data.get('total_conversas', 0)}")
+        info_para.add_run(f"\nTotal de Vendedores: {vendor_data.get('total_vendedores', 0)}")
+        info_para.add_run(f"\nTotal de Ligações Analisadas: {vendor_data.get('total_conversas', 0)}")
         
         # Quebra de página
         doc.add_page_break()
     
-    def _add_executive_summary(self, doc: Document, vendor_data: Dict):
+    def _add_executive_summary(self, doc: Document, vendor_data: Dict, team_stats: Dict):
         """
         Adiciona resumo executivo
         """
         doc.add_heading('📊 RESUMO EXECUTIVO', level=1)
         
-        team_stats = vendor_data.get('estatisticas_equipe', {})
-        
         # Parágrafo introdutório
         intro_para = doc.add_paragraph()
-        intro_para.add_run("Este relatório apresenta uma análise abrangente da performance de vendas da equipe VVN, ").add_run(
+        intro_para.add_run("Este relatório apresenta uma análise abrangente da performance de vendas da equipe VVN, ")
+        intro_para.add_run(
             f"baseada na análise de {vendor_data.get('total_conversas', 0)} ligações "
         ).bold = True
         intro_para.add_run(f"de {vendor_data.get('total_vendedores', 0)} vendedores diferentes.")
@@ -102,9 +250,6 @@ class WordReportGenerator:
         # Métricas principais
         doc.add_heading('🎯 Métricas Principais da Equipe', level=2)
         
-        metrics_table = doc.add_table(rows=4, cols=2)
-        metrics_table.style = 'Table Grid'
-        
         metrics_data = [
             ('📈 Nota Média da Equipe', f"{team_stats.get('nota_media_equipe', 0)}/10"),
             ('💰 Taxa de Conversão Média', f"{team_stats.get('taxa_conversao_media', 0)}%"),
@@ -112,10 +257,7 @@ class WordReportGenerator:
             ('🏆 Melhor Vendedor', team_stats.get('melhor_vendedor', 'N/A'))
         ]
         
-        for i, (metric, value) in enumerate(metrics_data):
-            metrics_table.cell(i, 0).text = metric
-            metrics_table.cell(i, 1).text = str(value)
-            metrics_table.cell(i, 0).paragraphs[0].runs[0].bold = True
+        self._add_table(doc, [[metric, str(value)] for metric, value in metrics_data], bold_first_col=True)
         
         # Resultados consolidados
         doc.add_heading('📋 Resultados Consolidados', level=2)
@@ -124,10 +266,10 @@ class WordReportGenerator:
         results_para.add_run("Vendas Fechadas: ").bold = True
         results_para.add_run(f"{team_stats.get('total_vendas_fechadas', 0)} ligações")
         
-        results_para.add_run("\\nFollow-ups Agendados: ").bold = True
+        results_para.add_run("\nFollow-ups Agendados: ").bold = True
         results_para.add_run(f"{team_stats.get('total_follow_ups', 0)} ligações")
         
-        results_para.add_run("\\nClientes Perdidos: ").bold = True
+        results_para.add_run("\nClientes Perdidos: ").bold = True
         results_para.add_run(f"{team_stats.get('total_clientes_perdidos', 0)} ligações")
         
         # Vendedor que precisa de atenção
@@ -138,7 +280,7 @@ class WordReportGenerator:
         
         doc.add_page_break()
     
-    def _add_team_statistics(self, doc: Document, vendor_data: Dict):
+    def _add_team_statistics(self, doc: Document, vendors: Dict):
         """
         Adiciona estatísticas da equipe
         """
@@ -147,45 +289,46 @@ class WordReportGenerator:
         # Ranking de vendedores
         doc.add_heading('🏆 Ranking de Vendedores', level=2)
         
-        vendors = vendor_data.get('vendedores', {})
-        
-        # Ordena vendedores por nota média
-        sorted_vendors = sorted(
-            vendors.items(),
-            key=lambda x: x[1]['estatisticas'].get('nota_media', 0),
-            reverse=True
+        # Melhores vendedores por nota média; (nota, nome, estatísticas) é montado uma
+        # vez e a seleção compara só a nota, sem lambda nem buscas por comparação.
+        # nlargest mantém a ordem de sorted (estável) sem ordenar a equipe inteira
+        ranking = heapq.nlargest(
+            self.RANKING_TOP_K,
+            ((vendor_info['estatisticas'].get('nota_media', 0), vendor_name, vendor_info['estatisticas'])
+             for vendor_name, vendor_info in vendors.items()),
+            key=itemgetter(0)
         )
         
-        if sorted_vendors:
-            ranking_table = doc.add_table(rows=len(sorted_vendors) + 1, cols=5)
-            ranking_table.style = 'Table Grid'
-            
+        if ranking:
             # Cabeçalho
-            headers = ['Posição', 'Vendedor', 'Nota Média', 'Taxa Conversão', 'Total Ligações']
-            for i, header in enumerate(headers):
-                cell = ranking_table.cell(0, i)
-                cell.text = header
-                cell.paragraphs[0].runs[0].bold = True
+            rows = [['Posição', 'Vendedor', 'Nota Média', 'Taxa Conversão', 'Total Ligações']]
             
             # Dados dos vendedores
-            for i, (vendor_name, vendor_info) in enumerate(sorted_vendors, 1):
-                stats = vendor_info['estatisticas']
-                
-                ranking_table.cell(i, 0).text = str(i)
-                ranking_table.cell(i, 1).text = vendor_name
-                ranking_table.cell(i, 2).text = f"{stats.get('nota_media', 0)}/10"
-                ranking_table.cell(i, 3).text = f"{stats.get('taxa_conversao', 0)}%"
-                ranking_table.cell(i, 4).text = str(stats.get('total_conversas', 0))
+            for i, (nota_media, vendor_name, stats) in enumerate(ranking, 1):
+                rows.append([
+                    str(i),
+                    vendor_name,
+                    f"{nota_media}/10",
+                    f"{stats.get('taxa_conversao', 0)}%",
+                    str(stats.get('total_conversas', 0))
+                ])
+            
+            self._add_table(doc, rows, bold_first_row=True)
+            
+            if len(vendors) > len(ranking):
+                doc.add_paragraph(f"... e mais {len(vendors) - len(ranking)} vendedor(es)")
         
         doc.add_page_break()
     
-    def _add_vendor_reports(self, doc: Document, vendor_data: Dict):
+    def _add_vendor_reports(self, doc: Document, vendors: Dict):
         """
         Adiciona relatórios individuais por vendedor
         """
-        doc.add_heading('👥 RELATÓRIOS INDIVIDUAIS POR VENDEDOR', level=1)
+        # Sem vendedores a seção ficaria só com o título
+        if not vendors:
+            return
         
-        vendors = vendor_data.get('vendedores', {})
+        doc.add_heading('👥 RELATÓRIOS INDIVIDUAIS POR VENDEDOR', level=1)
         
         for vendor_name, vendor_info in vendors.items():
             self._add_individual_vendor_report(doc, vendor_name, vendor_info)
@@ -205,9 +348,6 @@ class WordReportGenerator:
         # Resumo do vendedor
         doc.add_heading('📊 Resumo de Performance', level=3)
         
-        summary_table = doc.add_table(rows=6, cols=2)
-        summary_table.style = 'Table Grid'
-        
         summary_data = [
             ('🎯 Nível de Performance', insights.get('nivel_performance', 'N/A')),
             ('📈 Nota Geral', f"{insights.get('nota_geral', 0)}/10"),
@@ -217,45 +357,37 @@ class WordReportGenerator:
             ('⭐ Taxa Ligações Qualidade', f"{insights.get('taxa_ligacoes_qualidade', 0)}%")
         ]
         
-        for i, (metric, value) in enumerate(summary_data):
-            summary_table.cell(i, 0).text = metric
-            summary_table.cell(i, 1).text = str(value)
-            summary_table.cell(i, 0).paragraphs[0].runs[0].bold = True
+        self._add_table(doc, [[metric, str(value)] for metric, value in summary_data], bold_first_col=True)
         
         # Pontos fortes
         pontos_fortes = insights.get('pontos_fortes_principais', [])
         if pontos_fortes:
             doc.add_heading('✅ Pontos Fortes Principais', level=3)
-            for ponto in pontos_fortes:
-                doc.add_paragraph(f"• {ponto}", style='List Bullet')
+            self._add_bullet_list(doc, pontos_fortes)
         
         # Áreas de melhoria
         areas_melhoria = insights.get('areas_melhoria_principais', [])
         if areas_melhoria:
             doc.add_heading('🔧 Áreas de Melhoria', level=3)
-            for area in areas_melhoria:
-                doc.add_paragraph(f"• {area}", style='List Bullet')
+            self._add_bullet_list(doc, areas_melhoria)
         
         # Prioridades de treinamento
         prioridades = insights.get('prioridades_treinamento', [])
         if prioridades:
             doc.add_heading('🎓 Prioridades de Treinamento', level=3)
-            for prioridade in prioridades:
-                doc.add_paragraph(f"• {prioridade}", style='List Bullet')
+            self._add_bullet_list(doc, prioridades)
         
         # Objeções mais enfrentadas
         objecoes = insights.get('objecoes_mais_enfrentadas', [])
         if objecoes:
             doc.add_heading('❓ Objeções Mais Enfrentadas', level=3)
-            for objecao in objecoes:
-                doc.add_paragraph(f"• {objecao}", style='List Bullet')
+            self._add_bullet_list(doc, objecoes)
         
         # Produtos mais trabalhados
         produtos = insights.get('produtos_mais_trabalhados', [])
         if produtos:
             doc.add_heading('🛍️ Produtos Mais Trabalhados', level=3)
-            for produto in produtos:
-                doc.add_paragraph(f"• {produto}", style='List Bullet')
+            self._add_bullet_list(doc, produtos)
         
         # Recomendação principal
         recomendacao = insights.get('recomendacao_principal')
@@ -267,8 +399,7 @@ class WordReportGenerator:
         proximos_passos = insights.get('proximos_passos', [])
         if proximos_passos:
             doc.add_heading('🚀 Próximos Passos', level=3)
-            for passo in proximos_passos:
-                doc.add_paragraph(f"• {passo}", style='List Bullet')
+            self._add_bullet_list(doc, proximos_passos)
         
         # Estatísticas detalhadas
         doc.add_heading('📋 Estatísticas Detalhadas', level=3)
@@ -283,7 +414,7 @@ class WordReportGenerator:
         detailed_stats.add_run(" | Pior Nota: ").bold = True
         detailed_stats.add_run(f"{stats.get('pior_nota', 0)}/10")
         
-        detailed_stats.add_run("\\nVendas Fechadas: ").bold = True
+        detailed_stats.add_run("\nVendas Fechadas: ").bold = True
         detailed_stats.add_run(f"{stats.get('vendas_fechadas', 0)}")
         
         detailed_stats.add_run(" | Follow-ups: ").bold = True
@@ -303,29 +434,35 @@ class WordReportGenerator:
             class_para.add_run(f"C (Regular): {classificacoes.get('C', 0)} ligações | ")
             class_para.add_run(f"D (Precisa Melhorar): {classificacoes.get('D', 0)} ligações")
         
-        # Lista de ligações (resumida)
-        if conversations:
+        # Lista de ligações (resumida): no máximo 5, inseridas em um único bloco
+        top_conversations = conversations[:5]
+        if top_conversations:
             doc.add_heading('📞 Resumo das Ligações', level=3)
             
-            for i, conversation in enumerate(conversations[:5], 1):  # Máximo 5 ligações
+            paragraphs = []
+            for i, conversation in enumerate(top_conversations, 1):
                 analysis = conversation.get('analise', {})
                 classification = conversation.get('classificacao', {})
                 
-                call_para = doc.add_paragraph()
-                call_para.add_run(f"Ligação {i}: ").bold = True
-                call_para.add_run(f"{analysis.get('arquivo_origem', 'N/A')}")
+                details = (
+                    f"{analysis.get('arquivo_origem', 'N/A')}"
+                    f" | Nota: {classification.get('nota_vendedor', 0)}/10"
+                    f" | Classificação: {classification.get('classificacao', 'N/A')}"
+                    f" | Resultado: {analysis.get('resultado_conversa', 'N/A')}"
+                )
                 
-                call_para.add_run(f" | Nota: {classification.get('nota_vendedor', 0)}/10")
-                call_para.add_run(f" | Classificação: {classification.get('classificacao', 'N/A')}")
-                call_para.add_run(f" | Resultado: {analysis.get('resultado_conversa', 'N/A')}")
+                resumo = analysis.get('resumo_executivo')
+                if resumo:
+                    details += f"\n   Resumo: {resumo}"
                 
-                if analysis.get('resumo_executivo'):
-                    call_para.add_run(f"\\n   Resumo: {analysis['resumo_executivo']}")
+                paragraphs.append(_paragraph_xml(_run_xml(f"Ligação {i}: ", bold=True) + _run_xml(details)))
             
             if len(conversations) > 5:
-                doc.add_paragraph(f"... e mais {len(conversations) - 5} ligação(ões)")
+                paragraphs.append(_paragraph_xml(_run_xml(f"... e mais {len(conversations) - 5} ligação(ões)")))
+            
+            self._add_paragraphs(doc, ''.join(paragraphs))
     
-    def _add_recommendations(self, doc: Document, vendor_data: Dict):
+    def _add_recommendations(self, doc: Document, team_stats: Dict, vendors: Dict, generated_at: str):
         """
         Adiciona recomendações gerais
         """
@@ -334,19 +471,13 @@ class WordReportGenerator:
         # Recomendações para a equipe
         doc.add_heading('👥 Para a Equipe', level=2)
         
-        team_stats = vendor_data.get('estatisticas_equipe', {})
-        vendors = vendor_data.get('vendedores', {})
-        
         # Análise geral da equipe
         nota_media_equipe = team_stats.get('nota_media_equipe', 0)
         taxa_conversao_media = team_stats.get('taxa_conversao_media', 0)
         
-        if nota_media_equipe < 6:
-            doc.add_paragraph("🚨 URGENTE: A nota média da equipe está abaixo de 6. Recomenda-se treinamento intensivo em técnicas básicas de vendas.")
-        elif nota_media_equipe < 7:
-            doc.add_paragraph("⚠️ A equipe tem potencial de melhoria. Foco em treinamentos específicos por vendedor.")
-        else:
-            doc.add_paragraph("✅ A equipe está performando bem. Manter padrão atual e focar em casos específicos.")
+        doc.add_paragraph(
+            self._TEAM_RECOMMENDATIONS[bisect_right(self._TEAM_GRADE_THRESHOLDS, nota_media_equipe)]
+        )
         
         if taxa_conversao_media < 20:
             doc.add_paragraph("📈 Taxa de conversão baixa. Implementar treinamento em técnicas de fechamento e identificação de oportunidades.")
@@ -354,44 +485,44 @@ class WordReportGenerator:
         # Recomendações por vendedor
         doc.add_heading('👤 Por Vendedor', level=2)
         
+        default_recommendation = self._VENDOR_RECOMMENDATIONS['Excelente']
+        paragraphs = []
         for vendor_name, vendor_info in vendors.items():
             insights = vendor_info.get('insights', {})
             
-            vendor_rec_para = doc.add_paragraph()
-            vendor_rec_para.add_run(f"{vendor_name}: ").bold = True
-            
-            nivel_performance = insights.get('nivel_performance', '')
-            if nivel_performance == 'Precisa Melhorar':
-                vendor_rec_para.add_run("Prioridade alta para treinamento. ")
-            elif nivel_performance == 'Regular':
-                vendor_rec_para.add_run("Acompanhamento próximo e treinamento específico. ")
-            elif nivel_performance == 'Bom':
-                vendor_rec_para.add_run("Manter performance e trabalhar pontos específicos. ")
-            else:
-                vendor_rec_para.add_run("Excelente performance, pode ser mentor para outros. ")
-            
+            recommendation = self._VENDOR_RECOMMENDATIONS.get(insights.get('nivel_performance', ''),
+                                                              default_recommendation)
             recomendacao = insights.get('recomendacao_principal', '')
             if recomendacao:
-                vendor_rec_para.add_run(recomendacao)
+                recommendation += recomendacao
+            
+            paragraphs.append(_paragraph_xml(_run_xml(f"{vendor_name}: ", bold=True) + _run_xml(recommendation)))
+        
+        self._add_paragraphs(doc, ''.join(paragraphs))
         
         # Próximos passos para gestão
         doc.add_heading('🎯 Próximos Passos para Gestão', level=2)
         
-        next_steps = [
-            "Implementar plano de treinamento baseado nas prioridades identificadas",
-            "Agendar reuniões individuais com vendedores que precisam de atenção",
-            "Criar programa de mentoria com os melhores vendedores",
-            "Monitorar progresso mensalmente com nova análise de ligações",
-            "Desenvolver scripts para objeções mais comuns identificadas"
-        ]
-        
-        for step in next_steps:
-            doc.add_paragraph(f"• {step}", style='List Bullet')
+        self._add_bullet_list(doc, self._MANAGEMENT_NEXT_STEPS)
         
         # Rodapé
         doc.add_paragraph()
         footer_para = doc.add_paragraph()
         footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
         footer_para.add_run("Relatório gerado automaticamente pelo VVN AI Analyzer").italic = True
-        footer_para.add_run(f"\\n{datetime.now().strftime('%d/%m/%Y %H:%M')}").italic = True
+        footer_para.add_run(f"\n{generated_at}").italic = True
+
 
+def render_report(vendor_data: Dict, output_path: str) -> str:
+    """
+    Gera o relatório completo; função de módulo para poder ser executada em
+    outro processo (ProcessPoolExecutor)
+    
+    Args:
+        vendor_data: Dados processados de todos os vendedores
+        output_path: Caminho para salvar o arquivo
+        
+    Returns:
+        Caminho do arquivo gerado
+    """
+    return WordReportGenerator().generate_comprehensive_report(vendor_data, output_path)
@@ -0,0 +1,80 @@
+"""
+Testes do recebimento de áudios em /process
+"""
+import sys
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as app_module
+
+BOUNDARY = 'vvn-boundary'
+
+
+def multipart_body(audio, closed=True):
+    """
+    Formulário com as chaves das APIs antes do áudio, como o enviado pela página
+    """
+    parts = []
+    for name, value in (('assemblyai_key', 'chave-assemblyai'), ('openai_key', 'chave-openai')):
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="audio_files"; '
+                 f'filename="ligacao.mp3"\r\nContent-Type: audio/mpeg\r\n\r\n'.encode())
+    parts.append(audio)
+    if closed:
+        parts.append(f'\r\n--{BOUNDARY}--\r\n'.encode())
+    return b''.join(parts)
+
+
+class StubTranscriptionService:
+    """
+    Consome os blocos repassados como o upload real, registrando quando termina
+    """
+    def __init__(self):
+        self.finished = threading.Event()
+    
+    def upload_audio_stream(self, chunks, file_name):
+        for _ in chunks:
+            pass
+        self.finished.set()
+        return 'https://example.invalid/audio'
+
+
+class ProcessUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+        self.service = StubTranscriptionService()
+        patcher = mock.patch.object(app_module, 'get_transcription_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def post(self, body):
+        return self.client.post('/process', data=body,
+                                content_type=f'multipart/form-data; boundary={BOUNDARY}')
+    
+    def test_truncated_body_releases_forward_worker(self):
+        with mock.patch.object(app_module.pipeline_executor, 'submit') as submit:
+            response = self.post(multipart_body(b'\x00' * 4096, closed=False))
+        
+        self.assertFalse(response.get_json()['success'])
+        submit.assert_not_called()
+        # Sem o descarte, a thread do upload ficaria esperando blocos para sempre
+        self.assertTrue(self.service.finished.wait(timeout=5))
+    
+    def test_complete_body_is_handed_to_pipeline(self):
+        with mock.patch.object(app_module.pipeline_executor, 'submit') as submit, \
+                mock.patch.object(app_module, 'write_status'):
+            response = self.post(multipart_body(b'\x00' * 4096))
+        
+        self.assertEqual(response.status_code, 202)
+        submit.assert_called_once()
+        uploads = submit.call_args.args[2]
+        self.assertEqual(list(uploads.audio_urls.values()), ['https://example.invalid/audio'])
+        self.assertTrue(self.service.finished.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Testes do cache de estatísticas por vendedor
+"""
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import vendor_grouping_service
+from vendor_grouping_service import VendorGroupingService
+
+
+class CountingGroupingService(VendorGroupingService):
+    """
+    Conta quantos vendedores foram realmente calculados (sem vir do cache)
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.computed = 0
+    
+    def calculate_vendor_statistics(self, vendor_conversations, timestamp=None):
+        self.computed += 1
+        return super().calculate_vendor_statistics(vendor_conversations, timestamp)
+
+
+def make_conversations(timestamp, seed):
+    """
+    Conversas como as do pipeline: metadados de execução novos a cada rodada e ordem
+    de chegada embaralhada (segue a conclusão das transcrições)
+    """
+    conversations = []
+    for index in range(40):
+        conversations.append({
+            'arquivo_origem': f'ligacao_{index}.mp3',
+            'analise': {
+                'vendedor': ('Ana', 'Bruno', 'Carla')[index % 3],
+                'nota_vendedor': 4 + index % 7,
+                'sentimento_geral': ('positivo', 'neutro', 'negativo')[index % 3],
+                'resultado_conversa': ('venda_fechada', 'follow_up_agendado', 'cliente_perdido')[index % 3],
+                'classificacao_ligacao': 'ABCD'[index % 4],
+                'objecoes_cliente': ['Preço alto', 'Prazo'][:index % 3],
+                'pontos_fortes': ['Cordialidade', 'Clareza', 'Empatia'][index % 3:],
+                'arquivo_origem': f'ligacao_{index}.mp3',
+                'timestamp_analise': timestamp,
+                'modelo_usado': 'gpt-4o-mini'
+            }
+        })
+    random.Random(seed).shuffle(conversations)
+    return conversations
+
+
+class VendorSummaryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+    
+    def test_second_run_over_same_analyses_hits_cache(self):
+        first = CountingGroupingService(self.cache_dir.name)
+        first_result = first.process_all_vendors(make_conversations('2024-01-01T10:00:00', seed=1))
+        self.assertEqual(first.computed, 3)
+        
+        second = CountingGroupingService(self.cache_dir.name)
+        second_result = second.process_all_vendors(make_conversations('2024-01-02T15:30:00', seed=2))
+        self.assertEqual(second.computed, 0)
+        
+        for vendor_name, report in first_result['vendedores'].items():
+            cached = second_result['vendedores'][vendor_name]
+            for section, timestamp_key in (('estatisticas', 'timestamp_calculo'), ('insights', 'timestamp_insights')):
+                expected = {key: value for key, value in report[section].items() if key != timestamp_key}
+                actual = {key: value for key, value in cached[section].items() if key != timestamp_key}
+                self.assertEqual(actual, expected)
+                self.assertEqual(cached[section][timestamp_key], second_result['timestamp_processamento'])
+    
+    def test_changed_analysis_is_recomputed(self):
+        VendorGroupingService(self.cache_dir.name).process_all_vendors(make_conversations('2024-01-01', seed=1))
+        
+        conversations = make_conversations('2024-01-02', seed=1)
+        conversations[0]['analise']['nota_vendedor'] = 1
+        service = CountingGroupingService(self.cache_dir.name)
+        service.process_all_vendors(conversations)
+        self.assertEqual(service.computed, 1)
+    
+    def test_new_cache_version_is_recomputed(self):
+        VendorGroupingService(self.cache_dir.name).process_all_vendors(make_conversations('2024-01-01', seed=1))
+        
+        service = CountingGroupingService(self.cache_dir.name)
+        with mock.patch.object(vendor_grouping_service, 'SUMMARY_CACHE_VERSION',
+                               vendor_grouping_service.SUMMARY_CACHE_VERSION + 1):
+            service.process_all_vendors(make_conversations('2024-01-01', seed=1))
+        self.assertEqual(service.computed, 3)
+    
+    def test_refresh_ignores_cache(self):
+        VendorGroupingService(self.cache_dir.name).process_all_vendors(make_conversations('2024-01-01', seed=1))
+        
+        service = CountingGroupingService(self.cache_dir.name)
+        service.process_all_vendors(make_conversations('2024-01-01', seed=1), refresh=True)
+        self.assertEqual(service.computed, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,68 @@
 """
 Serviço de Transcrição usando AssemblyAI
 """
+import logging
 import os
+import random
 import requests
 import time
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import partial
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime
+import orjson
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Conexões mantidas abertas com o AssemblyAI (uploads e consultas simultâneos)
+MAX_HTTP_CONNECTIONS = 16
+# (conexão, leitura) em segundos
+HTTP_TIMEOUT = (10, 600)
+# Intervalo entre consultas ao resultado: começa curto e cresce até o limite (segundos)
+POLL_INITIAL_DELAY = 1.0
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 15.0
+# Tamanho dos blocos lidos do disco no upload (o padrão do http.client é 8 KiB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _new_session() -> requests.Session:
+    """
+    Sessão HTTP com pool de conexões persistentes: o handshake TLS é feito uma vez
+    e reaproveitado por todos os uploads e consultas
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_HTTP_CONNECTIONS)
+    session.mount("https://", adapter)
+    return session
+
+
+def _read_chunks(f: BinaryIO, size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Lê o arquivo em blocos grandes, enviados com Transfer-Encoding chunked
+    """
+    return iter(partial(f.read, size), b"")
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Espera pedida pelo servidor no cabeçalho Retry-After (em segundos), se houver
+    """
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
 
 
 class AssemblyAITranscriptionService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: Optional[requests.Session] = None):
         self.api_key = api_key
         self.headers = {"authorization": api_key}
         self.upload_url = "https://api.assemblyai.com/v2/upload"
         self.transcript_url = "https://api.assemblyai.com/v2/transcript"
+        self.session = session or _new_session()
     
     def upload_audio_file(self, audio_path: str) -> Optional[str]:
         """
@@ -26,21 +75,45 @@ class AssemblyAITranscriptionService:
             URL do áudio no AssemblyAI ou None se falhar
         """
         try:
-            print(f"📤 Fazendo upload de {os.path.basename(audio_path)}...")
+            file_name = os.path.basename(audio_path)
+            logger.info("📤 Fazendo upload de %s...", file_name)
             
             with open(audio_path, "rb") as f:
-                response = requests.post(self.upload_url, headers=self.headers, data=f)
-            
-            if response.status_code == 200:
-                upload_data = response.json()
-                print(f"✅ Upload concluído para {os.path.basename(audio_path)}")
-                return upload_data["upload_url"]
-            else:
-                print(f"❌ Erro no upload: {response.status_code} - {response.text}")
-                return None
+                return self._upload(_read_chunks(f), file_name)
                 
         except Exception as e:
-            print(f"❌ Erro ao fazer upload: {str(e)}")
+            logger.error("❌ Erro ao fazer upload: %s", e)
+            return None
+    
+    def upload_audio_stream(self, chunks: Iterable[bytes], file_name: str) -> Optional[str]:
+        """
+        Faz upload de um áudio à medida que seus blocos chegam, sem arquivo local
+        
+        Args:
+            chunks: Blocos de bytes do áudio, enviados com Transfer-Encoding chunked
+            file_name: Nome do arquivo (apenas para os logs)
+            
+        Returns:
+            URL do áudio no AssemblyAI ou None se falhar
+        """
+        try:
+            logger.info("📤 Enviando %s direto para o AssemblyAI...", file_name)
+            return self._upload(chunks, file_name)
+            
+        except Exception as e:
+            logger.error("❌ Erro ao fazer upload: %s", e)
+            return None
+    
+    def _upload(self, data, file_name: str) -> Optional[str]:
+        headers = {**self.headers, "content-type": "application/octet-stream"}
+        response = self.session.post(self.upload_url, headers=headers, data=data, timeout=HTTP_TIMEOUT)
+        
+        if response.status_code == 200:
+            upload_data = orjson.loads(response.content)
+            logger.info("✅ Upload concluído para %s", file_name)
+            return upload_data["upload_url"]
+        else:
+            logger.error("❌ Erro no upload: %s - %s", response.status_code, response.text)
             return None
     
     def submit_transcription_job(self, audio_url: str, language_code: str = "pt") -> Optional[str]:
@@ -55,7 +128,7 @@ class AssemblyAITranscriptionService:
             ID do job de transcrição ou None se falhar
         """
         try:
-            print("📝 Submetendo job de transcrição...")
+            logger.info("📝 Submetendo job de transcrição...")
             
             json_data = {
                 "audio_url": audio_url,
@@ -67,19 +140,20 @@ class AssemblyAITranscriptionService:
                 "entity_detection": False
             }
             
-            response = requests.post(self.transcript_url, headers=self.headers, json=json_data)
+            response = self.session.post(self.transcript_url, headers=self.headers, json=json_data,
+                                         timeout=HTTP_TIMEOUT)
             
             if response.status_code == 200:
-                job_data = response.json()
+                job_data = orjson.loads(response.content)
                 job_id = job_data["id"]
-                print(f"✅ Job de transcrição submetido! ID: {job_id}")
+                logger.info("✅ Job de transcrição submetido! ID: %s", job_id)
                 return job_id
             else:
-                print(f"❌ Erro ao submeter job: {response.status_code} - {response.text}")
+                logger.error("❌ Erro ao submeter job: %s - %s", response.status_code, response.text)
                 return None
                 
         except Exception as e:
-            print(f"❌ Erro ao submeter job de transcrição: {str(e)}")
+            logger.error("❌ Erro ao submeter job de transcrição: %s", e)
             return None
     
     def get_transcription_result(self, job_id: str, max_wait_time: int = 600) -> Optional[Dict]:
@@ -94,28 +168,37 @@ class AssemblyAITranscriptionService:
             Dicionário com resultado da transcrição ou None se falhar
         """
         try:
-            print(f"⏳ Aguardando resultado da transcrição (Job ID: {job_id})...")
+            logger.info("⏳ Aguardando resultado da transcrição (Job ID: %s)...", job_id)
             
             polling_endpoint = f"{self.transcript_url}/{job_id}"
             start_time = time.time()
+            delay = POLL_INITIAL_DELAY
             
             while True:
                 # Verifica se excedeu o tempo limite
                 if time.time() - start_time > max_wait_time:
-                    print(f"❌ Timeout: Transcrição demorou mais que {max_wait_time} segundos")
+                    logger.error("❌ Timeout: Transcrição demorou mais que %s segundos", max_wait_time)
                     return None
                 
-                polling_response = requests.get(polling_endpoint, headers=self.headers)
+                polling_response = self.session.get(polling_endpoint, headers=self.headers, timeout=HTTP_TIMEOUT)
+                
+                if polling_response.status_code == 429:
+                    # Limite de requisições: espera o que o servidor pedir e consulta de novo
+                    wait = _retry_after(polling_response) or delay
+                    logger.warning("⏳ Limite de requisições atingido, nova consulta em %.0fs...", wait)
+                    time.sleep(wait)
+                    delay = min(POLL_MAX_DELAY, delay * POLL_BACKOFF)
+                    continue
                 
                 if polling_response.status_code != 200:
-                    print(f"❌ Erro ao verificar status: {polling_response.status_code}")
+                    logger.error("❌ Erro ao verificar status: %s", polling_response.status_code)
                     return None
                 
-                transcription_result = polling_response.json()
+                transcription_result = orjson.loads(polling_response.content)
                 status = transcription_result["status"]
                 
                 if status == "completed":
-                    print("✅ Transcrição concluída!")
+                    logger.info("✅ Transcrição concluída!")
                     return {
                         "text": transcription_result["text"],
                         "confidence": transcription_result.get("confidence", 0),
@@ -126,30 +209,38 @@ class AssemblyAITranscriptionService:
                     }
                 elif status == "error":
                     error_msg = transcription_result.get("error", "Erro desconhecido")
-                    print(f"❌ Erro na transcrição: {error_msg}")
+                    logger.error("❌ Erro na transcrição: %s", error_msg)
                     return None
                 else:
-                    print(f"Status: {status}. Aguardando...")
-                    time.sleep(5)  # Espera 5 segundos antes de verificar novamente
+                    logger.debug("Status: %s. Aguardando...", status)
+                    # Jobs curtos são detectados logo; nos longos as consultas ficam espaçadas.
+                    # O jitter evita que transcrições paralelas consultem todas ao mesmo tempo
+                    time.sleep(_retry_after(polling_response) or delay + random.uniform(0, 0.5))
+                    delay = min(POLL_MAX_DELAY, delay * POLL_BACKOFF)
                     
         except Exception as e:
-            print(f"❌ Erro ao obter resultado da transcrição: {str(e)}")
+            logger.error("❌ Erro ao obter resultado da transcrição: %s", e)
             return None
     
-    def transcribe_audio_file(self, audio_path: str, language_code: str = "pt") -> Optional[Dict]:
+    def transcribe_audio_file(self, audio_path: str, language_code: str = "pt",
+                              audio_url: Optional[str] = None) -> Optional[Dict]:
         """
         Processo completo de transcrição de um arquivo de áudio
         
         Args:
             audio_path: Caminho para o arquivo de áudio
             language_code: Código do idioma
+            audio_url: URL de um upload já feito (opcional; dispensa o envio do arquivo)
             
         Returns:
             Dicionário com resultado da transcrição e metadados
         """
         try:
+            file_name = os.path.basename(audio_path)
+            
             # 1. Upload do arquivo
-            audio_url = self.upload_audio_file(audio_path)
+            if not audio_url:
+                audio_url = self.upload_audio_file(audio_path)
             if not audio_url:
                 return None
             
@@ -165,7 +256,7 @@ class AssemblyAITranscriptionService:
             
             # 4. Adicionar metadados
             result = {
-                "arquivo_origem": os.path.basename(audio_path),
+                "arquivo_origem": file_name,
                 "caminho_completo": audio_path,
                 "texto": transcription_data["text"],
                 "confianca": transcription_data["confidence"],
@@ -177,39 +268,72 @@ class AssemblyAITranscriptionService:
                 "job_id": job_id
             }
             
-            print(f"✅ Transcrição completa para {os.path.basename(audio_path)}")
+            logger.info("✅ Transcrição completa para %s", file_name)
             return result
             
         except Exception as e:
-            print(f"❌ Erro no processo de transcrição: {str(e)}")
+            logger.error("❌ Erro no processo de transcrição: %s", e)
             return None
     
-    def transcribe_multiple_files(self, audio_files: list, language_code: str = "pt") -> list:
+    def transcribe_multiple_files(self, audio_files: list, language_code: str = "pt",
+                                  max_workers: int = 8, out_jsonl: Optional[str] = None) -> List[Dict]:
         """
         Transcreve múltiplos arquivos de áudio
         
         Args:
             audio_files: Lista de caminhos para arquivos de áudio
             language_code: Código do idioma
-            
+            max_workers: Transcrições simultâneas
+            out_jsonl: Arquivo JSONL onde cada transcrição é gravada ao terminar (opcional)
+        
         Returns:
-            Lista de resultados de transcrição
+            Lista de resultados de transcrição, na ordem em que ficaram prontos
+        """
+        return list(self.iter_transcribe_multiple_files(audio_files, language_code, max_workers, out_jsonl))
+    
+    def iter_transcribe_multiple_files(self, audio_files: list, language_code: str = "pt",
+                                       max_workers: int = 8, out_jsonl: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Transcreve múltiplos arquivos de áudio, entregando cada resultado assim que fica pronto
+        
+        Os arquivos são transcritos em paralelo: cada um passa a maior parte do
+        tempo aguardando o AssemblyAI, então o tempo total é o do mais demorado.
+        Nenhuma lista com todas as transcrições é mantida em memória.
+        
+        Args:
+            audio_files: Lista de caminhos para arquivos de áudio
+            language_code: Código do idioma
+            max_workers: Transcrições simultâneas
+            out_jsonl: Arquivo JSONL onde cada transcrição é acrescentada ao terminar (opcional)
+        
+        Returns:
+            Iterador com os resultados de transcrição, na ordem em que ficam prontos
         """
-        results = []
         total_files = len(audio_files)
+        succeeded = 0
         
-        print(f"🚀 Iniciando transcrição de {total_files} arquivo(s)...")
+        logger.info("🚀 Iniciando transcrição de %d arquivo(s)...", total_files)
         
-        for i, audio_path in enumerate(audio_files, 1):
-            print(f"\n📊 Processando arquivo {i}/{total_files}: {os.path.basename(audio_path)}")
+        with ExitStack() as stack:
+            out = stack.enter_context(open(out_jsonl, "ab")) if out_jsonl else None
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=max(1, min(max_workers, total_files))))
+            futures = {executor.submit(self.transcribe_audio_file, audio_path, language_code): audio_path
+                       for audio_path in audio_files}
             
-            result = self.transcribe_audio_file(audio_path, language_code)
-            if result:
-                results.append(result)
-                print(f"✅ Sucesso ({i}/{total_files})")
-            else:
-                print(f"❌ Falha ({i}/{total_files})")
+            for i, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if not result:
+                    logger.error("❌ Falha (%d/%d): %s", i, total_files, os.path.basename(futures[future]))
+                    continue
+                
+                succeeded += 1
+                logger.info("✅ Sucesso (%d/%d): %s", i, total_files, result["arquivo_origem"])
+                
+                if out:
+                    # Cada transcrição já paga fica registrada, mesmo se o processo cair no meio do lote
+                    out.write(orjson.dumps(result) + b"\n")
+                    out.flush()
+                
+                yield result
         
-        print(f"\n🎉 Transcrição concluída! {len(results)}/{total_files} arquivo(s) processado(s) com sucesso.")
-        return results
-
+        logger.info("🎉 Transcrição concluída! %d/%d arquivo(s) processado(s) com sucesso.", succeeded, total_files)
@@ -1,15 +1,194 @@
 """
 Serviço de Agrupamento e Análise por Vendedor
 """
-from typing import Dict, List
-from collections import defaultdict
-import statistics
+import bisect
+import hashlib
+import heapq
+import math
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+from collections import Counter, defaultdict
 from datetime import datetime
+from functools import lru_cache, partial
+from itertools import islice
+from operator import itemgetter
+
+import orjson
+from diskcache import Cache
+
+# Abaixo deste número de conversas o custo de iniciar processos supera o ganho
+PARALLEL_MIN_CONVERSATIONS = 500
+
+# Metadados da análise que mudam a cada execução sem afetar as estatísticas; ficam fora
+# da chave do cache junto com os campos timestamp_*
+SUMMARY_KEY_IGNORED_FIELDS = frozenset({'arquivo_origem', 'modelo_usado'})
+
+# Versão do cálculo de estatísticas e insights, parte da chave do cache: incremente
+# ao mudar fórmulas, limites, tabelas de regras ou textos, para não servir resultados antigos
+SUMMARY_CACHE_VERSION = 1
+
+# Nomes que o modelo usa quando não identifica o vendedor (em minúsculas)
+UNKNOWN_VENDOR_NAMES = frozenset({'não identificado', 'não informado', 'desconhecido'})
+
+def _mean(values: List[float]) -> float:
+    """
+    Média aritmética (lista não vazia); fsum evita o acúmulo de erro da soma sem
+    o custo das frações exatas de statistics.mean
+    """
+    return math.fsum(values) / len(values)
+
+
+def _median(values: List[float]) -> float:
+    """
+    Mediana (lista não vazia), como statistics.median
+    """
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def _percent(count: int, total: int) -> float:
+    """
+    Percentual com uma casa decimal (total > 0), arredondado em aritmética inteira;
+    empates exatos sobem (10 de 32 -> 31,3%), sem depender da representação binária
+    do float como round() (que dava 31,2%)
+    """
+    return (count * 2000 + total) // (2 * total) / 10
+
+
+@lru_cache(maxsize=8192)
+def _normalize_item(item: str) -> str:
+    """
+    Forma canônica de um item qualitativo (sem espaços nas pontas, em minúsculas);
+    as mesmas objeções e produtos se repetem muito, então cada texto é normalizado uma vez
+    """
+    return item.strip().lower()
+
+
+_item_name = itemgetter('item')
+
+
+def _frequency_rank(entry: Tuple[str, int]) -> Tuple[int, str]:
+    """
+    Ordem dos itens mais comuns: maior frequência primeiro, empates em ordem alfabética
+    """
+    item, count = entry
+    return -count, item
+
+
+def _top_item_names(items: List[Dict], top_n: int = 3) -> List[str]:
+    """
+    Nomes dos primeiros itens de uma lista de _get_most_common_items
+    """
+    return list(map(_item_name, islice(items, top_n)))
+
+
+# Resultado da conversa -> índice do contador (vendas fechadas, follow-ups, clientes
+# perdidos; -1: nenhum). Valores fora da tabela são classificados por _match_result_bucket
+RESULT_BUCKETS = {
+    'venda_fechada': 0,
+    'follow_up_agendado': 1,
+    'cliente_perdido': 2,
+    'indefinido': -1,
+    '': -1
+}
+
+
+def _match_result_bucket(resultado: str) -> int:
+    """
+    Índice do contador para resultados fora de RESULT_BUCKETS, pelo trecho do texto
+    """
+    # Rótulo conhecido com espaços nas pontas: basta a tabela
+    resultado = resultado.strip()
+    bucket = RESULT_BUCKETS.get(resultado)
+    if bucket is not None:
+        return bucket
+    
+    # Variações ("cliente_perdido_para_concorrente"); "perdido" não é prefixo de
+    # "cliente_perdido", por isso a busca continua sendo por trecho
+    if 'venda_fechada' in resultado:
+        return 0
+    if 'follow_up' in resultado:
+        return 1
+    if 'perdido' in resultado:
+        return 2
+    return -1
+
+
+# Classificações contadas por vendedor (outros valores são ignorados)
+CLASSIFICATION_GRADES = ('A', 'B', 'C', 'D')
+
+# Campos qualitativos contados por vendedor: (campo da análise, chave nas estatísticas)
+QUALITATIVE_FIELDS = (
+    ('objecoes_cliente', 'objecoes_mais_comuns'),
+    ('pontos_fortes', 'pontos_fortes_principais'),
+    ('pontos_melhoria', 'areas_melhoria_principais'),
+    ('recomendacoes_especificas', 'recomendacoes_principais'),
+    ('produtos_mencionados', 'produtos_mais_vendidos')
+)
+
+# Nível de performance pela nota média: abaixo de 4, de 4 a 6, de 6 a 8, 8 ou mais
+PERFORMANCE_THRESHOLDS = (4, 6, 8)
+PERFORMANCE_LEVELS = ('Precisa Melhorar', 'Regular', 'Bom', 'Excelente')
+
+# Regras disparadas quando a estatística fica abaixo do limite: (chave, limite, texto)
+TRAINING_PRIORITY_RULES = (
+    ('taxa_conversao', 20, 'Técnicas de fechamento'),
+    ('percentual_sentimentos_positivos', 60, 'Relacionamento com cliente'),
+    ('percentual_a_b', 50, 'Qualidade geral das ligações')
+)
+NEXT_STEP_RULES = (
+    ('taxa_conversao', 20, "Participar de treinamento de técnicas de fechamento"),
+    ('percentual_sentimentos_positivos', 60, "Praticar escuta ativa e empatia com clientes")
+)
+
+# Vale a primeira regra disparada; sem nenhuma, a recomendação padrão
+MAIN_RECOMMENDATION_RULES = (
+    ('nota_media', 5, "Foco em treinamento básico de vendas e atendimento ao cliente"),
+    ('taxa_conversao', 15, "Desenvolver técnicas de fechamento e identificação de oportunidades"),
+    ('percentual_sentimentos_positivos', 50, "Melhorar relacionamento e comunicação com clientes")
+)
+DEFAULT_MAIN_RECOMMENDATION = "Manter bom desempenho e focar em casos específicos de melhoria"
 
 
 class VendorGroupingService:
-    def __init__(self):
-        pass
+    def __init__(self, cache_dir: Optional[str] = None, cache_ttl: Optional[float] = None):
+        # Cache persistente de estatísticas e insights por vendedor (None desativa),
+        # aberto sob demanda em cada processo
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self._cache = None
+    
+    def __getstate__(self):
+        # O cache não é enviado aos processos do pool
+        state = self.__dict__.copy()
+        state['_cache'] = None
+        return state
+    
+    def _get_cache(self) -> Optional[Cache]:
+        if self._cache is None and self.cache_dir:
+            self._cache = Cache(self.cache_dir)
+        return self._cache
+    
+    @staticmethod
+    def _summary_key(vendor_name: str, conversations: List[Dict]) -> str:
+        """
+        Chave do cache: o vendedor e o conteúdo das análises das suas conversas, sem os
+        metadados de execução e em qualquer ordem (as estatísticas não dependem dela;
+        a ordem de chegada segue a conclusão das transcrições)
+        """
+        analyses = sorted(
+            orjson.dumps({
+                field: value for field, value in conversation.get('analise', {}).items()
+                if field not in SUMMARY_KEY_IGNORED_FIELDS and not field.startswith('timestamp_')
+            }, option=orjson.OPT_SORT_KEYS, default=str)
+            for conversation in conversations
+        )
+        # JSON não tem quebras de linha literais: a junção não é ambígua
+        payload = b'\n'.join([orjson.dumps([SUMMARY_CACHE_VERSION, vendor_name]), *analyses])
+        return hashlib.blake2b(payload, digest_size=32).hexdigest()
     
     def group_conversations_by_vendor(self, analyzed_conversations: List[Dict]) -> Dict[str, List[Dict]]:
         """
@@ -32,24 +211,30 @@ class VendorGroupingService:
             
             vendor_groups[vendor_name].append(conversation)
         
-        return dict(vendor_groups)
+        # Sem a fábrica padrão o defaultdict se comporta como dict comum, sem copiá-lo
+        vendor_groups.default_factory = None
+        return vendor_groups
     
-    def _normalize_vendor_name(self, vendor_name: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _normalize_vendor_name(vendor_name: str) -> str:
         """
-        Normaliza o nome do vendedor para agrupamento consistente
+        Normaliza o nome do vendedor para agrupamento consistente; os mesmos nomes se
+        repetem em muitas ligações, então cada um é normalizado uma única vez
         """
-        if not vendor_name or vendor_name.lower() in ['não identificado', 'não informado', 'desconhecido']:
+        if not vendor_name or vendor_name.lower() in UNKNOWN_VENDOR_NAMES:
             return 'Não identificado'
         
         # Remove espaços extras e capitaliza
         return vendor_name.strip().title()
     
-    def calculate_vendor_statistics(self, vendor_conversations: List[Dict]) -> Dict:
+    def calculate_vendor_statistics(self, vendor_conversations: List[Dict], timestamp: Optional[str] = None) -> Dict:
         """
         Calcula estatísticas consolidadas para um vendedor
         
         Args:
             vendor_conversations: Lista de conversas do vendedor
+            timestamp: Horário do cálculo (opcional; padrão: agora)
             
         Returns:
             Dicionário com estatísticas do vendedor
@@ -60,119 +245,105 @@ class VendorGroupingService:
         # Extrai dados das análises
         notas = []
         sentimentos_positivos = 0
-        vendas_fechadas = 0
-        follow_ups = 0
-        clientes_perdidos = 0
-        classificacoes = {'A': 0, 'B': 0, 'C': 0, 'D': 0}
+        result_counts = [0, 0, 0]
+        classification_counts = Counter()
         
-        todas_objecoes = []
-        todos_pontos_fortes = []
-        todos_pontos_melhoria = []
-        todas_recomendacoes = []
-        produtos_mencionados = []
+        # Frequência de cada item qualitativo (normalizado) e total de itens por campo,
+        # contados já na passada pelas conversas, sem listas intermediárias
+        frequencies = {field: Counter() for field, _ in QUALITATIVE_FIELDS}
+        totals = dict.fromkeys(frequencies, 0)
         
         for conversation in vendor_conversations:
             analysis = conversation.get('analise', {})
             
-            # Notas
+            # Notas: VendorAnalysisService entrega número ou nenhuma nota (a análise completa é
+            # validada e a simplificada tem a nota convertida); valores não numéricos de
+            # outras origens falham na comparação e ficam de fora
             nota = analysis.get('nota_vendedor', 0)
-            if isinstance(nota, (int, float)) and nota > 0:
-                notas.append(nota)
+            try:
+                if nota > 0:
+                    notas.append(nota)
+            except TypeError:
+                pass
             
             # Sentimentos
             if analysis.get('sentimento_geral') == 'positivo':
                 sentimentos_positivos += 1
             
-            # Resultados
+            # Resultados: rótulos conhecidos por consulta direta, sem buscar trechos no texto
             resultado = analysis.get('resultado_conversa', '')
-            if 'venda_fechada' in resultado:
-                vendas_fechadas += 1
-            elif 'follow_up' in resultado:
-                follow_ups += 1
-            elif 'perdido' in resultado:
-                clientes_perdidos += 1
+            bucket = RESULT_BUCKETS.get(resultado)
+            if bucket is None:
+                bucket = _match_result_bucket(resultado)
+            if bucket >= 0:
+                result_counts[bucket] += 1
             
             # Classificações
-            classificacao = analysis.get('classificacao_ligacao', 'D')
-            if classificacao in classificacoes:
-                classificacoes[classificacao] += 1
-            
-            # Coleta dados qualitativos
-            if analysis.get('objecoes_cliente'):
-                todas_objecoes.extend(analysis['objecoes_cliente'])
+            classification_counts[analysis.get('classificacao_ligacao', 'D')] += 1
             
-            if analysis.get('pontos_fortes'):
-                todos_pontos_fortes.extend(analysis['pontos_fortes'])
-            
-            if analysis.get('pontos_melhoria'):
-                todos_pontos_melhoria.extend(analysis['pontos_melhoria'])
-            
-            if analysis.get('recomendacoes_especificas'):
-                todas_recomendacoes.extend(analysis['recomendacoes_especificas'])
-            
-            if analysis.get('produtos_mencionados'):
-                produtos_mencionados.extend(analysis['produtos_mencionados'])
+            # Conta dados qualitativos
+            for field, frequency in frequencies.items():
+                items = analysis.get(field)
+                if items:
+                    totals[field] += len(items)
+                    frequency.update(_normalize_item(item) for item in items if item and isinstance(item, str))
         
         total_conversas = len(vendor_conversations)
+        vendas_fechadas, follow_ups, clientes_perdidos = result_counts
+        classificacoes = {grade: classification_counts[grade] for grade in CLASSIFICATION_GRADES}
         
         # Calcula estatísticas
         stats = {
             'total_conversas': total_conversas,
-            'nota_media': round(statistics.mean(notas), 1) if notas else 0,
-            'nota_mediana': round(statistics.median(notas), 1) if notas else 0,
+            'nota_media': round(_mean(notas), 1) if notas else 0,
+            'nota_mediana': round(_median(notas), 1) if notas else 0,
             'melhor_nota': max(notas) if notas else 0,
             'pior_nota': min(notas) if notas else 0,
             
             'sentimentos_positivos': sentimentos_positivos,
-            'percentual_sentimentos_positivos': round((sentimentos_positivos / total_conversas) * 100, 1),
+            'percentual_sentimentos_positivos': _percent(sentimentos_positivos, total_conversas),
             
             'vendas_fechadas': vendas_fechadas,
             'follow_ups_agendados': follow_ups,
             'clientes_perdidos': clientes_perdidos,
-            'taxa_conversao': round((vendas_fechadas / total_conversas) * 100, 1),
+            'taxa_conversao': _percent(vendas_fechadas, total_conversas),
             
             'classificacoes': classificacoes,
-            'percentual_a_b': round(((classificacoes['A'] + classificacoes['B']) / total_conversas) * 100, 1),
+            'percentual_a_b': _percent(classificacoes['A'] + classificacoes['B'], total_conversas),
             
-            'objecoes_mais_comuns': self._get_most_common_items(todas_objecoes, 5),
-            'pontos_fortes_principais': self._get_most_common_items(todos_pontos_fortes, 5),
-            'areas_melhoria_principais': self._get_most_common_items(todos_pontos_melhoria, 5),
-            'recomendacoes_principais': self._get_most_common_items(todas_recomendacoes, 5),
-            'produtos_mais_vendidos': self._get_most_common_items(produtos_mencionados, 5),
+            **{
+                stats_key: self._get_most_common_items(frequencies[field], totals[field], 5)
+                for field, stats_key in QUALITATIVE_FIELDS
+            },
             
-            'timestamp_calculo': datetime.now().isoformat()
+            'timestamp_calculo': timestamp or datetime.now().isoformat()
         }
         
         return stats
     
-    def _get_most_common_items(self, items_list: List[str], top_n: int = 5) -> List[Dict]:
+    @staticmethod
+    def _get_most_common_items(frequency: Counter, total: int, top_n: int = 5) -> List[Dict]:
         """
-        Retorna os itens mais comuns de uma lista
+        Retorna os itens mais comuns a partir da contagem já feita
+        
+        Args:
+            frequency: Frequência de cada item normalizado (minúsculas, sem espaços nas pontas)
+            total: Total de itens recebidos, inclusive os inválidos (base do percentual)
+            top_n: Quantidade de itens retornados
         """
-        if not items_list:
-            return []
-        
-        # Conta frequência dos itens
-        frequency = defaultdict(int)
-        for item in items_list:
-            if item and isinstance(item, str):
-                frequency[item.strip().lower()] += 1
-        
-        # Ordena por frequência
-        sorted_items = sorted(frequency.items(), key=lambda x: x[1], reverse=True)
-        
-        # Retorna top N com formatação
-        result = []
-        for item, count in sorted_items[:top_n]:
-            result.append({
+        # Top N por frequência sem ordenar todos os itens; empates em ordem alfabética,
+        # para o resultado não depender da ordem das conversas
+        return [
+            {
                 'item': item.title(),
                 'frequencia': count,
-                'percentual': round((count / len(items_list)) * 100, 1)
-            })
-        
-        return result
+                'percentual': _percent(count, total)
+            }
+            for item, count in heapq.nsmallest(top_n, frequency.items(), key=_frequency_rank)
+        ]
     
-    def generate_vendor_insights(self, vendor_name: str, vendor_conversations: List[Dict], vendor_stats: Dict) -> Dict:
+    def generate_vendor_insights(self, vendor_name: str, vendor_conversations: List[Dict], vendor_stats: Dict,
+                                 timestamp: Optional[str] = None) -> Dict:
         """
         Gera insights consolidados para um vendedor
         
@@ -180,96 +351,80 @@ class VendorGroupingService:
             vendor_name: Nome do vendedor
             vendor_conversations: Lista de conversas do vendedor
             vendor_stats: Estatísticas calculadas do vendedor
+            timestamp: Horário dos insights (opcional; padrão: agora)
             
         Returns:
             Dicionário com insights consolidados
         """
+        # Cada estatística é lida uma vez só
+        get_stat = vendor_stats.get
+        nota_media = get_stat('nota_media', 0)
+        taxa_conversao = get_stat('taxa_conversao', 0)
+        sentimentos_positivos = get_stat('percentual_sentimentos_positivos', 0)
+        percentual_a_b = get_stat('percentual_a_b', 0)
+        
         # Determina nível de performance baseado na nota média
-        nota_media = vendor_stats.get('nota_media', 0)
-        if nota_media >= 8:
-            nivel_performance = 'Excelente'
-        elif nota_media >= 6:
-            nivel_performance = 'Bom'
-        elif nota_media >= 4:
-            nivel_performance = 'Regular'
-        else:
-            nivel_performance = 'Precisa Melhorar'
+        nivel_performance = PERFORMANCE_LEVELS[bisect.bisect_right(PERFORMANCE_THRESHOLDS, nota_media)]
         
         # Determina prioridades de treinamento
-        prioridades_treinamento = []
-        
-        if vendor_stats.get('taxa_conversao', 0) < 20:
-            prioridades_treinamento.append('Técnicas de fechamento')
-        
-        if vendor_stats.get('percentual_sentimentos_positivos', 0) < 60:
-            prioridades_treinamento.append('Relacionamento com cliente')
-        
-        if vendor_stats.get('percentual_a_b', 0) < 50:
-            prioridades_treinamento.append('Qualidade geral das ligações')
+        prioridades_treinamento = [
+            priority for key, limit, priority in TRAINING_PRIORITY_RULES
+            if get_stat(key, 0) < limit
+        ]
         
         # Identifica pontos fortes e fracos
-        pontos_fortes = [item['item'] for item in vendor_stats.get('pontos_fortes_principais', [])[:3]]
-        areas_melhoria = [item['item'] for item in vendor_stats.get('areas_melhoria_principais', [])[:3]]
+        pontos_fortes = _top_item_names(get_stat('pontos_fortes_principais', ()))
+        areas_melhoria = _top_item_names(get_stat('areas_melhoria_principais', ()))
         
         insights = {
             'vendedor': vendor_name,
             'nivel_performance': nivel_performance,
             'nota_geral': nota_media,
-            'total_ligacoes': vendor_stats.get('total_conversas', 0),
+            'total_ligacoes': get_stat('total_conversas', 0),
             
             'pontos_fortes_principais': pontos_fortes,
             'areas_melhoria_principais': areas_melhoria,
             'prioridades_treinamento': prioridades_treinamento,
             
-            'taxa_conversao': vendor_stats.get('taxa_conversao', 0),
-            'taxa_sentimento_positivo': vendor_stats.get('percentual_sentimentos_positivos', 0),
-            'taxa_ligacoes_qualidade': vendor_stats.get('percentual_a_b', 0),
+            'taxa_conversao': taxa_conversao,
+            'taxa_sentimento_positivo': sentimentos_positivos,
+            'taxa_ligacoes_qualidade': percentual_a_b,
             
-            'objecoes_mais_enfrentadas': [item['item'] for item in vendor_stats.get('objecoes_mais_comuns', [])[:3]],
-            'produtos_mais_trabalhados': [item['item'] for item in vendor_stats.get('produtos_mais_vendidos', [])[:3]],
+            'objecoes_mais_enfrentadas': _top_item_names(get_stat('objecoes_mais_comuns', ())),
+            'produtos_mais_trabalhados': _top_item_names(get_stat('produtos_mais_vendidos', ())),
             
             'recomendacao_principal': self._generate_main_recommendation(vendor_stats),
             'proximos_passos': self._generate_next_steps(vendor_stats),
             
-            'timestamp_insights': datetime.now().isoformat()
+            'timestamp_insights': timestamp or datetime.now().isoformat()
         }
         
         return insights
     
-    def _generate_main_recommendation(self, vendor_stats: Dict) -> str:
+    @staticmethod
+    def _generate_main_recommendation(vendor_stats: Dict) -> str:
         """
         Gera recomendação principal baseada nas estatísticas
         """
-        nota_media = vendor_stats.get('nota_media', 0)
-        taxa_conversao = vendor_stats.get('taxa_conversao', 0)
-        sentimentos_positivos = vendor_stats.get('percentual_sentimentos_positivos', 0)
-        
-        if nota_media < 5:
-            return "Foco em treinamento básico de vendas e atendimento ao cliente"
-        elif taxa_conversao < 15:
-            return "Desenvolver técnicas de fechamento e identificação de oportunidades"
-        elif sentimentos_positivos < 50:
-            return "Melhorar relacionamento e comunicação com clientes"
-        else:
-            return "Manter bom desempenho e focar em casos específicos de melhoria"
+        get_stat = vendor_stats.get
+        for key, limit, recommendation in MAIN_RECOMMENDATION_RULES:
+            if get_stat(key, 0) < limit:
+                return recommendation
+        return DEFAULT_MAIN_RECOMMENDATION
     
-    def _generate_next_steps(self, vendor_stats: Dict) -> List[str]:
+    @staticmethod
+    def _generate_next_steps(vendor_stats: Dict) -> List[str]:
         """
         Gera próximos passos baseados nas estatísticas
         """
-        steps = []
+        get_stat = vendor_stats.get
+        steps = [step for key, limit, step in NEXT_STEP_RULES if get_stat(key, 0) < limit]
         
-        if vendor_stats.get('taxa_conversao', 0) < 20:
-            steps.append("Participar de treinamento de técnicas de fechamento")
-        
-        if vendor_stats.get('percentual_sentimentos_positivos', 0) < 60:
-            steps.append("Praticar escuta ativa e empatia com clientes")
-        
-        areas_melhoria = vendor_stats.get('areas_melhoria_principais', [])
+        areas_melhoria = get_stat('areas_melhoria_principais')
         if areas_melhoria:
             steps.append(f"Trabalhar especificamente em: {areas_melhoria[0]['item']}")
         
-        if vendor_stats.get('nota_media', 0) >= 7:
+        if get_stat('nota_media', 0) >= 7:
             steps.append("Compartilhar boas práticas com a equipe")
         
         if not steps:
@@ -277,12 +432,23 @@ class VendorGroupingService:
         
         return steps[:4]  # Máximo 4 próximos passos
     
-    def process_all_vendors(self, analyzed_conversations: List[Dict]) -> Dict:
+    def _summarize_vendor(self, vendor: Tuple[str, List[Dict]], timestamp: Optional[str] = None) -> Tuple[Dict, Dict]:
+        """
+        Estatísticas e insights de um vendedor, a partir de (nome, conversas)
+        """
+        vendor_name, conversations = vendor
+        stats = self.calculate_vendor_statistics(conversations, timestamp)
+        return stats, self.generate_vendor_insights(vendor_name, conversations, stats, timestamp)
+    
+    def process_all_vendors(self, analyzed_conversations: List[Dict], workers: Optional[int] = None,
+                            refresh: bool = False) -> Dict:
         """
         Processa todos os vendedores e gera relatório consolidado
         
         Args:
             analyzed_conversations: Lista de todas as conversas analisadas
+            workers: Processos usados com mais de PARALLEL_MIN_CONVERSATIONS conversas (opcional)
+            refresh: Recalcula todos os vendedores, ignorando o cache (que é atualizado)
             
         Returns:
             Dicionário com dados consolidados de todos os vendedores
@@ -293,15 +459,47 @@ class VendorGroupingService:
         vendor_groups = self.group_conversations_by_vendor(analyzed_conversations)
         
         vendor_reports = {}
+        # Todos os vendedores do lote compartilham o mesmo horário
+        timestamp = datetime.now().isoformat()
+        summarize = partial(self._summarize_vendor, timestamp=timestamp)
+        
+        # Vendedores com as mesmas análises de um processamento anterior vêm do cache
+        cache = self._get_cache()
+        cache_keys = {}
+        summaries = {}
+        if cache is not None:
+            for vendor_name, conversations in vendor_groups.items():
+                key = cache_keys[vendor_name] = self._summary_key(vendor_name, conversations)
+                cached = None if refresh else cache.get(key)
+                if cached is not None:
+                    stats, insights = cached
+                    stats['timestamp_calculo'] = insights['timestamp_insights'] = timestamp
+                    summaries[vendor_name] = cached
+        
+        # Calcula estatísticas e gera insights dos demais vendedores
+        pending = [(vendor_name, conversations) for vendor_name, conversations in vendor_groups.items()
+                   if vendor_name not in summaries]
+        if (workers and workers > 1 and len(pending) > 1
+                and sum(len(conversations) for _, conversations in pending) > PARALLEL_MIN_CONVERSATIONS):
+            # Vendedores são independentes: divididos entre processos. Só as análises são
+            # enviadas; as conversas, com as transcrições, ficam aqui
+            tasks = [
+                (vendor_name, [{'analise': conversation.get('analise', {})} for conversation in conversations])
+                for vendor_name, conversations in pending
+            ]
+            with multiprocessing.get_context('spawn').Pool(workers) as pool:
+                computed = pool.map(summarize, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+        else:
+            computed = map(summarize, pending)
+        
+        for (vendor_name, _), summary in zip(pending, computed):
+            summaries[vendor_name] = summary
+            if cache is not None:
+                cache.set(cache_keys[vendor_name], summary, expire=self.cache_ttl)
         
         for vendor_name, conversations in vendor_groups.items():
-            print(f"📊 Processando vendedor: {vendor_name} ({len(conversations)} conversas)")
-            
-            # Calcula estatísticas
-            stats = self.calculate_vendor_statistics(conversations)
-            
-            # Gera insights
-            insights = self.generate_vendor_insights(vendor_name, conversations, stats)
+            stats, insights = summaries[vendor_name]
+            print(f"📊 Vendedor processado: {vendor_name} ({len(conversations)} conversas)")
             
             vendor_reports[vendor_name] = {
                 'conversas': conversations,
@@ -317,69 +515,60 @@ class VendorGroupingService:
             'estatisticas_equipe': team_stats,
             'total_vendedores': len(vendor_reports),
             'total_conversas': len(analyzed_conversations),
-            'timestamp_processamento': datetime.now().isoformat()
+            'timestamp_processamento': timestamp
         }
         
         print(f"✅ Processamento concluído: {len(vendor_reports)} vendedor(es), {len(analyzed_conversations)} conversa(s)")
         
         return result
     
-    def _calculate_team_statistics(self, vendor_reports: Dict) -> Dict:
+    @staticmethod
+    def _calculate_team_statistics(vendor_reports: Dict) -> Dict:
         """
-        Calcula estatísticas consolidadas da equipe
+        Calcula estatísticas consolidadas da equipe em uma única passada pelos vendedores
         """
         if not vendor_reports:
             return {}
         
-        all_stats = [report['estatisticas'] for report in vendor_reports.values()]
+        # Valores para as médias da equipe
+        notas_medias = []
+        taxas_conversao = []
+        sentimentos_positivos = []
+        total_vendas = total_follow_ups = total_perdidos = 0
         
-        # Médias da equipe
-        notas_medias = [stats.get('nota_media', 0) for stats in all_stats if stats.get('nota_media', 0) > 0]
-        taxas_conversao = [stats.get('taxa_conversao', 0) for stats in all_stats]
-        sentimentos_positivos = [stats.get('percentual_sentimentos_positivos', 0) for stats in all_stats]
+        # Melhor vendedor: maior nota média; que precisa de atenção: menor nota média
+        best_vendor, best_score = None, 0
+        worst_vendor, worst_score = None, 10
+        
+        for vendor_name, report in vendor_reports.items():
+            stats = report['estatisticas']
+            
+            nota_media = stats.get('nota_media', 0)
+            if nota_media > 0:
+                notas_medias.append(nota_media)
+            if nota_media > best_score:
+                best_vendor, best_score = vendor_name, nota_media
+            if stats.get('nota_media', 10) < worst_score:
+                worst_vendor, worst_score = vendor_name, stats['nota_media']
+            
+            taxas_conversao.append(stats.get('taxa_conversao', 0))
+            sentimentos_positivos.append(stats.get('percentual_sentimentos_positivos', 0))
+            
+            total_vendas += stats.get('vendas_fechadas', 0)
+            total_follow_ups += stats.get('follow_ups_agendados', 0)
+            total_perdidos += stats.get('clientes_perdidos', 0)
         
         team_stats = {
-            'nota_media_equipe': round(statistics.mean(notas_medias), 1) if notas_medias else 0,
-            'taxa_conversao_media': round(statistics.mean(taxas_conversao), 1) if taxas_conversao else 0,
-            'sentimento_positivo_medio': round(statistics.mean(sentimentos_positivos), 1) if sentimentos_positivos else 0,
+            'nota_media_equipe': round(_mean(notas_medias), 1) if notas_medias else 0,
+            'taxa_conversao_media': round(_mean(taxas_conversao), 1),
+            'sentimento_positivo_medio': round(_mean(sentimentos_positivos), 1),
             
-            'melhor_vendedor': self._find_best_vendor(vendor_reports),
-            'vendedor_precisa_atencao': self._find_vendor_needs_attention(vendor_reports),
+            'melhor_vendedor': best_vendor or 'Não identificado',
+            'vendedor_precisa_atencao': worst_vendor or 'Não identificado',
             
-            'total_vendas_fechadas': sum(stats.get('vendas_fechadas', 0) for stats in all_stats),
-            'total_follow_ups': sum(stats.get('follow_ups_agendados', 0) for stats in all_stats),
-            'total_clientes_perdidos': sum(stats.get('clientes_perdidos', 0) for stats in all_stats),
+            'total_vendas_fechadas': total_vendas,
+            'total_follow_ups': total_follow_ups,
+            'total_clientes_perdidos': total_perdidos,
         }
         
         return team_stats
-    
-    def _find_best_vendor(self, vendor_reports: Dict) -> str:
-        """
-        Identifica o melhor vendedor baseado na nota média
-        """
-        best_vendor = None
-        best_score = 0
-        
-        for vendor_name, report in vendor_reports.items():
-            nota_media = report['estatisticas'].get('nota_media', 0)
-            if nota_media > best_score:
-                best_score = nota_media
-                best_vendor = vendor_name
-        
-        return best_vendor or 'Não identificado'
-    
-    def _find_vendor_needs_attention(self, vendor_reports: Dict) -> str:
-        """
-        Identifica o vendedor que mais precisa de atenção
-        """
-        worst_vendor = None
-        worst_score = 10
-        
-        for vendor_name, report in vendor_reports.items():
-            nota_media = report['estatisticas'].get('nota_media', 10)
-            if nota_media < worst_score:
-                worst_score = nota_media
-                worst_vendor = vendor_name
-        
-        return worst_vendor or 'Não identificado'
-